@@ -4,20 +4,49 @@ SoupaWhisper - Voice dictation tool using faster-whisper.
 Hold the hotkey to record, release to transcribe and copy to clipboard.
 """
 
+from __future__ import annotations
+
 import argparse
 import configparser
+import ctypes
+import functools
+import io
+import itertools
+import json
+import queue
+import select
 import subprocess
 import tempfile
 import threading
+import shutil
 import signal
+import socket
+import struct
 import sys
 import os
 import time
+import wave
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Any
-
-from faster_whisper import WhisperModel
-from faster_whisper.vad import VadOptions
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from soupawhisper_client import default_socket_path
+from soupawhisper_daemon import (
+    SAMPLE_RATE,
+    DaemonServer,
+    ModelScheduler,
+    RemoteModel,
+    get_vad_options,
+    load_whisper_model,
+    start_daemon_server,
+    start_http_server,
+    warm_up_model,
+)
+
+# faster_whisper (ctranslate2, av, onnxruntime, tokenizers) is imported
+# where it is used, so importing this module and --version stay fast.
 
 __version__ = "0.1.0"
 
@@ -37,6 +66,8 @@ def load_config():
         "auto_type": "true",
         "notifications": "true",
         "audio_backend": "auto",
+        "capture": "pipe",
+        "preroll_ms": "500",
         "preferred_keyboard": "",
     }
 
@@ -49,57 +80,171 @@ def load_config():
         "compute_type": config.get(
             "whisper", "compute_type", fallback=defaults["compute_type"]
         ),
+        "warmup": config.getboolean("whisper", "warmup", fallback=True),
         "key": config.get("hotkey", "key", fallback=defaults["key"]),
+        "min_hold_ms": config.getint("hotkey", "min_hold_ms", fallback=0),
         "auto_type": config.getboolean("behavior", "auto_type", fallback=True),
         "notifications": config.getboolean("behavior", "notifications", fallback=True),
+        "typing_tool": config.get("behavior", "typing_tool", fallback="auto"),
+        "keymap": config.get("behavior", "keymap", fallback="us"),
+        "key_delay_ms": config.getint("behavior", "key_delay_ms", fallback=2),
+        "paste_threshold": config.getint("behavior", "paste_threshold", fallback=0),
+        "paste_keys": config.get("behavior", "paste_keys", fallback="ctrl+v"),
+        "stream_output": config.getboolean("behavior", "stream_output", fallback=False),
+        "incremental": config.getboolean("behavior", "incremental", fallback=False),
+        "live_typing": config.getboolean("behavior", "live_typing", fallback=False),
+        "live_interval_ms": config.getint(
+            "behavior", "live_interval_ms", fallback=1000
+        ),
         "audio_backend": config.get(
             "audio", "backend", fallback=defaults["audio_backend"]
         ),
+        "capture": config.get("audio", "capture", fallback=defaults["capture"]),
+        "warm_capture": config.getboolean("audio", "warm_capture", fallback=False),
+        "streaming_vad": config.getboolean("audio", "streaming_vad", fallback=True),
+        "gate_rms": config.getfloat("audio", "gate_rms", fallback=0.005),
+        "gate_min_ms": config.getint("audio", "gate_min_ms", fallback=250),
+        "preroll_ms": config.getint(
+            "audio", "preroll_ms", fallback=int(defaults["preroll_ms"])
+        ),
         "preferred_keyboard": config.get(
             "keyboard", "preferred_device", fallback=defaults["preferred_keyboard"]
         ),
+        "daemon_socket": config.get("daemon", "socket", fallback="")
+        or default_socket_path(),
+        "daemon_serve": config.getboolean("daemon", "serve", fallback=False),
+        "use_daemon": config.getboolean("daemon", "use_daemon", fallback=False),
+        "http": config.get("daemon", "http", fallback=""),
+        "batch_window_ms": config.getint("daemon", "batch_window_ms", fallback=0),
+        "max_batch_size": config.getint("daemon", "max_batch_size", fallback=8),
     }
 
 
-CONFIG = load_config()
+@functools.lru_cache(maxsize=None)
+def get_config():
+    """Return the configuration, loading it on first use."""
+    return load_config()
 
 
-def build_arecord_command(output_file):
-    """Build arecord command with required audio format."""
-    return [
+def build_arecord_command(output_file=None):
+    """Build arecord command with required audio format.
+
+    Without an output file, raw s16le samples are written to stdout.
+    """
+    command = [
         "arecord",
+        "-q",
         "-f",
         "S16_LE",  # Format: 16-bit little-endian
         "-r",
         "16000",  # Sample rate: 16kHz (what Whisper expects)
         "-c",
         "1",  # Mono
-        "-t",
-        "wav",
-        output_file,
     ]
+    if output_file is None:
+        return command + ["-t", "raw"]
+    return command + ["-t", "wav", output_file]
 
 
-def build_parecord_command(output_file):
-    """Build parecord command with required audio format."""
-    return [
-        "parecord",
-        "--rate=16000",
-        "--channels=1",
-        "--format=s16le",
-        "--file-format=wav",
-        output_file,
-    ]
+def build_parecord_command(output_file=None):
+    """Build parecord command with required audio format.
+
+    Without an output file, raw s16le samples are written to stdout.
+    """
+    command = ["parecord", "--rate=16000", "--channels=1", "--format=s16le"]
+    if output_file is None:
+        return command + ["--raw"]
+    return command + ["--file-format=wav", output_file]
+
+
+def build_pwrecord_command(output_file=None):
+    """Build pw-record command with required audio format.
+
+    Without an output file, raw s16le samples are written to stdout.
+    """
+    command = ["pw-record", "--rate=16000", "--channels=1", "--format=s16"]
+    if output_file is None:
+        return command + ["--raw", "-"]
+    return command + [output_file]
+
 
+PROBE_CACHE_PATH = Path.home() / ".cache" / "soupawhisper" / "probe.json"
 
-def build_pwrecord_command(output_file):
-    """Build pw-record command with required audio format."""
-    return ["pw-record", "--rate=16000", "--channels=1", "--format=s16", output_file]
+
+class ToolProbe:
+    """
+    Resolve external tools by scanning PATH in-process.
+
+    Results are persisted to PROBE_CACHE_PATH together with PATH and the
+    modification times of its directories. Installing or removing a tool
+    changes its directory's mtime, which invalidates the whole cache.
+    """
+
+    def __init__(self, cache_path=PROBE_CACHE_PATH):
+        self.cache_path = Path(cache_path)
+        self.search_path = os.environ.get("PATH", os.defpath)
+        self.fingerprint = self._fingerprint()
+        self.tools = self._load()
+        self.dirty = False
+
+    def _fingerprint(self):
+        mtimes = {}
+        for directory in self.search_path.split(os.pathsep):
+            try:
+                mtimes[directory] = os.stat(directory or ".").st_mtime_ns
+            except OSError:
+                mtimes[directory] = None
+        return {"path": self.search_path, "mtimes": mtimes}
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (
+            not isinstance(cached, dict)
+            or cached.get("fingerprint") != self.fingerprint
+        ):
+            return {}
+        return cached.get("tools", {})
+
+    def which(self, name):
+        """Return the full path of an executable on PATH, or None."""
+        if name not in self.tools:
+            self.tools[name] = shutil.which(name, path=self.search_path)
+            self.dirty = True
+        return self.tools[name]
+
+    def save(self):
+        """Persist newly resolved tools; failures only cost a rescan next start."""
+        if not self.dirty:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.cache_path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump({"fingerprint": self.fingerprint, "tools": self.tools}, f)
+            os.replace(temp_path, self.cache_path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not write probe cache: {e}")
+
+
+@functools.lru_cache(maxsize=None)
+def get_tools():
+    """Return the tool probe, reading the probe cache on first use."""
+    return ToolProbe()
+
+
+def has_tool(name):
+    """Check that an external command is available on PATH."""
+    return get_tools().which(name) is not None
 
 
 def detect_audio_backend():
     """Detect available audio recording backend with optional config override."""
-    config_backend = CONFIG.get("audio_backend", "auto")
+    config_backend = get_config().get("audio_backend", "auto")
 
     # Check for config override
     if config_backend != "auto":
@@ -110,7 +255,7 @@ def detect_audio_backend():
         }
         if config_backend in backend_map:
             cmd_name, builder = backend_map[str(config_backend)]
-            if subprocess.run(["which", cmd_name], capture_output=True).returncode == 0:
+            if has_tool(cmd_name):
                 return (cmd_name, builder)
             print(
                 f"Warning: Configured backend '{config_backend}' not found, using auto-detection"
@@ -122,186 +267,225 @@ def detect_audio_backend():
         ("pw-record", build_pwrecord_command),
         ("arecord", build_arecord_command),
     ]:
-        if subprocess.run(["which", cmd_name], capture_output=True).returncode == 0:
+        if has_tool(cmd_name):
             return (cmd_name, builder)
 
     return (None, None)
 
 
-AUDIO_BACKEND, AUDIO_COMMAND_BUILDER = detect_audio_backend()
+@functools.lru_cache(maxsize=None)
+def get_audio_backend():
+    """Return the (name, command builder) of the audio backend, detected once."""
+    backend = detect_audio_backend()
+    get_tools().save()
+    return backend
 
 
 def detect_clipboard_tool():
     """Detect available clipboard tool (Wayland only)."""
     # Only support wl-copy for Wayland
-    if subprocess.run(["which", "wl-copy"], capture_output=True).returncode == 0:
+    if has_tool("wl-copy"):
         return "wl-copy"
     return None
 
 
-def is_dotoold_running():
-    """Check if dotoold daemon is running."""
-    result = subprocess.run(["pgrep", "-x", "dotoold"], capture_output=True)
-    return result.returncode == 0
+def is_process_running(name):
+    """Check for a process by exact name, like pgrep -x, by scanning /proc/*/comm."""
+    try:
+        entries = os.scandir("/proc")
+    except OSError:
+        return False
+    with entries:
+        for entry in entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry.name}/comm") as f:
+                    if f.read().rstrip("\n") == name:
+                        return True
+            except OSError:
+                # Process exited while scanning
+                continue
+    return False
 
 
 def is_kwin_wayland():
     """Check if running under KDE Plasma Wayland (KWin)."""
-    result = subprocess.run(["pgrep", "-x", "kwin_wayland"], capture_output=True)
-    return result.returncode == 0
+    return is_process_running("kwin_wayland")
 
 
 def detect_typing_tool():
     """Detect available typing tool (Wayland only - dotool or wtype)."""
     # KDE Plasma Wayland (KWin) doesn't fully support virtual-keyboard protocol
     # Prefer dotool for KDE Wayland
-    if is_kwin_wayland():
-        # Check dotool with daemon
-        if subprocess.run(["which", "dotool"], capture_output=True).returncode == 0:
-            if is_dotoold_running():
-                print(
-                    "Detected KDE Plasma Wayland - using dotool (Wayland apps supported)"
-                )
-                return "dotool"
-            else:
-                # Try to auto-start dotoold
-                print("Warning: dotool found but dotoold daemon is not running.")
-                print("Attempting to start dotoold...")
-                try:
-                    # Start dotoold as background process
-                    subprocess.Popen(
-                        ["dotoold"],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        start_new_session=True,
-                    )
-                    # Wait briefly for daemon to start
-                    time.sleep(0.2)
-                    # Check if it started successfully
-                    if is_dotoold_running():
-                        print(
-                            "Successfully started dotoold - using dotool (Wayland apps supported)"
-                        )
-                        print(
-                            "Note: For persistence, enable dotoold as a systemd user service:"
-                        )
-                        print("  systemctl --user enable --now dotoold")
-                        return "dotool"
-                    else:
-                        print("Failed to start dotoold.")
-                except Exception as e:
-                    print(f"Failed to start dotoold: {e}")
-                    print(
-                        "Hint: Start dotoold manually with 'dotoold' or enable as a service"
-                    )
+    if is_kwin_wayland() and has_tool("dotool"):
+        print("Detected KDE Plasma Wayland - using dotool (Wayland apps supported)")
+        return "dotool"
 
     # Try wtype for other Wayland compositors (doesn't work on KDE)
-    if subprocess.run(["which", "wtype"], capture_output=True).returncode == 0:
+    if has_tool("wtype"):
         if not is_kwin_wayland():  # wtype doesn't work on KDE
             return "wtype"
 
-    # Try dotool as fallback
-    if subprocess.run(["which", "dotool"], capture_output=True).returncode == 0:
-        if is_dotoold_running():
-            return "dotool"
-        else:
-            print("Warning: dotool found but dotoold daemon is not running.")
-            print("Attempting to start dotoold...")
-            try:
-                subprocess.Popen(
-                    ["dotoold"],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    start_new_session=True,
-                )
-                time.sleep(0.2)
-                if is_dotoold_running():
-                    print("Successfully started dotoold.")
-                    print(
-                        "Note: For persistence, enable as service: systemctl --user enable --now dotoold"
-                    )
-                    return "dotool"
-                else:
-                    print("Failed to start dotoold.")
-                    print(
-                        "Hint: Start it manually with 'dotoold' or enable as a service"
-                    )
-            except Exception as e:
-                print(f"Failed to start dotoold: {e}")
-                print("Hint: Start it manually with 'dotoold' or enable as a service")
+    # Try dotool as fallback. DotoolSession keeps one dotool process open,
+    # which creates its own virtual keyboard, so dotoold isn't needed
+    if has_tool("dotool"):
+        return "dotool"
 
     return None
 
 
-CLIPBOARD_TOOL = detect_clipboard_tool()
-TYPING_TOOL = detect_typing_tool()
+@functools.lru_cache(maxsize=None)
+def get_clipboard_tool():
+    """Return the clipboard tool, detected once."""
+    tool = detect_clipboard_tool()
+    get_tools().save()
+    return tool
 
 
-def _load_evdev_keyboard(key_name):
-    """
-    Load evdev for direct keyboard input on Wayland.
+@functools.lru_cache(maxsize=None)
+def get_typing_tool():
+    """Return the configured typing tool, or detect one."""
+    choice = get_config()["typing_tool"]
+    if choice == "uinput":
+        if os.access("/dev/uinput", os.W_OK):
+            return "uinput"
+        print("Warning: /dev/uinput is not writable (are you in the input group?)")
+        return None
+    if choice in ("wtype", "dotool"):
+        return choice if has_tool(choice) else None
+    tool = detect_typing_tool()
+    get_tools().save()
+    return tool
 
-    evdev reads directly from /dev/input/event* devices, which works on Wayland.
-    Requires user to be in 'input' group.
 
-    Returns a list of all suitable keyboard devices and the target key code.
-    This allows monitoring all keyboards simultaneously.
+# Input devices whose names contain these are never treated as keyboards
+VIRTUAL_KEYWORDS = ["dotool", "uinput", "virtual", "test device"]
+
+
+def _keyboard_key_count(dev):
+    """Return how many keys a physical keyboard-like device has, else None."""
+    from evdev import ecodes
+
+    # Check if device has keyboard capabilities
+    caps = dev.capabilities()
+    if ecodes.EV_KEY not in caps:
+        return None
+
+    # Check if it's a virtual device
+    name_lower = dev.name.lower()
+    if any(keyword in name_lower for keyword in VIRTUAL_KEYWORDS):
+        return None
+
+    # Count available keys to prefer physical keyboards (they have more keys)
+    return len(caps.get(ecodes.EV_KEY, []))
+
+
+# Where the kernel describes input devices, readable without opening them
+SYSFS_INPUT = "/sys/class/input"
+EV_KEY = 1  # evdev event type for keys, as in linux/input-event-codes.h
+
+
+def _parse_capability_bitmap(text):
     """
-    try:
-        from evdev import InputDevice, list_devices, categorize, ecodes
-    except ImportError as e:
-        raise ImportError(
-            f"evdev is required for Wayland keyboard support: {e}\n"
-            "Install with: pip install evdev\n"
-            "Also ensure your user is in the 'input' group: sudo usermod -aG input $USER"
-        )
+    Decode a sysfs capability bitmap into the set of bits it has set.
 
-    # Find keyboard devices
-    devices = [InputDevice(path) for path in list_devices()]
+    The kernel prints the bitmap as space-separated hex words of
+    BITS_PER_LONG bits, most significant word first.
+    """
+    word_bits = struct.calcsize("l") * 8
+    bits = set()
+    for index, word in enumerate(reversed(text.split())):
+        value = int(word, 16)
+        while value:
+            lowest = value & -value
+            bits.add(index * word_bits + lowest.bit_length() - 1)
+            value ^= lowest
+    return bits
+
+
+def _sysfs_input_device(event_name, root=SYSFS_INPUT):
+    """
+    Read the name and capabilities of an event node from sysfs.
 
-    # Filter for keyboard devices and exclude virtual ones
-    virtual_keywords = ["dotool", "uinput", "virtual", "test device"]
-    keyboards = []
+    Returns (name, event type bits, key code bits), or None when sysfs has no
+    such device.
+    """
+    base = os.path.join(root, event_name, "device")
+    try:
+        with open(os.path.join(base, "name")) as f:
+            name = f.read().strip()
+        with open(os.path.join(base, "capabilities", "ev")) as f:
+            ev_bits = _parse_capability_bitmap(f.read())
+        with open(os.path.join(base, "capabilities", "key")) as f:
+            key_bits = _parse_capability_bitmap(f.read())
+    except (OSError, ValueError):
+        return None
+    return name, ev_bits, key_bits
+
+
+def _sysfs_keyboard_key_count(info, target_key_code):
+    """
+    Return the key count of a sysfs device that can send the target key.
 
-    for dev in devices:
-        # Check if device has keyboard capabilities
-        caps = dev.capabilities()
-        if ecodes.EV_KEY in caps:
-            # Check if it's a virtual device
-            name_lower = dev.name.lower()
-            is_virtual = any(keyword in name_lower for keyword in virtual_keywords)
+    Devices without the key, or virtual ones, give None, so mice, power
+    buttons and headset controls never need to be opened.
+    """
+    name, ev_bits, key_bits = info
+    if EV_KEY not in ev_bits or target_key_code not in key_bits:
+        return None
+    if any(keyword in name.lower() for keyword in VIRTUAL_KEYWORDS):
+        return None
+    return len(key_bits)
 
-            if not is_virtual:
-                # Count available keys to prefer physical keyboards (they have more keys)
-                key_codes = caps.get(ecodes.EV_KEY, [])
-                keyboards.append((dev, len(key_codes)))
 
-    if not keyboards:
-        # List all available devices for debugging
-        print("Available input devices:")
-        for dev in devices:
-            print(f"  - {dev.name} ({dev.path})")
-        raise RuntimeError(
-            "No suitable keyboard devices found. Make sure you have read access to /dev/input/event*"
-        )
+def _scan_sysfs_keyboards(target_key_code, root=SYSFS_INPUT):
+    """
+    Find keyboards that can send the target key, without opening any device.
 
-    # Check if user has a preferred keyboard device in config
-    preferred_keyboard_name = str(CONFIG.get("preferred_keyboard", "")).lower()
+    Returns (ranked candidates, all devices) as lists of (event name, device
+    name, key count) and (event name, device name), or None if sysfs is not
+    available. root can point at a fixture tree for testing.
+    """
+    try:
+        entries = sorted(e for e in os.listdir(root) if e.startswith("event"))
+    except OSError:
+        return None
+
+    candidates = []
+    available = []
+    for event_name in entries:
+        info = _sysfs_input_device(event_name, root)
+        if info is None:
+            continue
+        available.append((event_name, info[0]))
+        key_count = _sysfs_keyboard_key_count(info, target_key_code)
+        if key_count is not None:
+            candidates.append((event_name, info[0], key_count))
+
+    candidates.sort(key=lambda candidate: _keyboard_rank(candidate[1], candidate[2]))
+    return candidates, available
+
+
+def _keyboard_rank(name, key_count):
+    """
+    Sort key for keyboards: 1) preferred device (if specified), 2) devices with
+    "keyboard" in name, 3) number of keys.
+    """
+    preferred_keyboard_name = str(get_config().get("preferred_keyboard", "")).lower()
+    is_preferred = bool(
+        preferred_keyboard_name and preferred_keyboard_name in name.lower()
+    )
+    has_keyboard_in_name = "keyboard" in name.lower()
+    # Return tuple: (is_preferred, has_keyboard, -key_count) for descending sort
+    # Preferred devices come first, then devices with "keyboard" in name, then sorted by key count
+    return (not is_preferred, not has_keyboard_in_name, -key_count)
 
-    # Sort by: 1) preferred device (if specified), 2) devices with "keyboard" in name, 3) number of keys
-    def sort_key(device_tuple):
-        dev, key_count = device_tuple
-        is_preferred = (
-            preferred_keyboard_name and preferred_keyboard_name in dev.name.lower()
-        )
-        has_keyboard_in_name = "keyboard" in dev.name.lower()
-        # Return tuple: (is_preferred, has_keyboard, -key_count) for descending sort
-        # Preferred devices come first, then devices with "keyboard" in name, then sorted by key count
-        return (not is_preferred, not has_keyboard_in_name, -key_count)
 
-    keyboards.sort(key=sort_key)
+def _evdev_key_code(key_name):
+    """Map a configured key name to its evdev key code."""
+    from evdev import ecodes
 
-    # Map key name to evdev key code
     key_map = {
         "f1": ecodes.KEY_F1,
         "f2": ecodes.KEY_F2,
@@ -321,7 +505,65 @@ def _load_evdev_keyboard(key_name):
     if key_name_lower not in key_map:
         raise ValueError(f"Unsupported key for evdev: {key_name}")
 
-    target_key = key_map[key_name_lower]
+    return key_map[key_name_lower]
+
+
+def _load_evdev_keyboard(key_name):
+    """
+    Load evdev for direct keyboard input on Wayland.
+
+    evdev reads directly from /dev/input/event* devices, which works on Wayland.
+    Requires user to be in 'input' group.
+
+    Returns a list of all suitable keyboard devices and the target key code.
+    This allows monitoring all keyboards simultaneously.
+    """
+    try:
+        from evdev import InputDevice, list_devices
+    except ImportError as e:
+        raise ImportError(
+            f"evdev is required for Wayland keyboard support: {e}\n"
+            "Install with: pip install evdev\n"
+            "Also ensure your user is in the 'input' group: sudo usermod -aG input $USER"
+        )
+
+    target_key = _evdev_key_code(key_name)
+
+    keyboards = []
+    scan = _scan_sysfs_keyboards(target_key)
+    if scan is not None:
+        # Rank from sysfs and only open the chosen keyboards
+        candidates, available = scan
+        for event_name, name, key_count in candidates:
+            try:
+                dev = InputDevice(os.path.join(KeyboardManager.INPUT_DIR, event_name))
+            except OSError as e:
+                print(f"Warning: Cannot open {name}: {e}")
+                continue
+            keyboards.append((dev, key_count))
+    else:
+        # No sysfs: open every device and check its capabilities
+        devices = [InputDevice(path) for path in list_devices()]
+        available = [(dev.path, dev.name) for dev in devices]
+
+        # Filter for keyboard devices and exclude virtual ones
+        for dev in devices:
+            key_count = _keyboard_key_count(dev)
+            if key_count is None:
+                dev.close()
+            else:
+                keyboards.append((dev, key_count))
+
+    if not keyboards:
+        # List all available devices for debugging
+        print("Available input devices:")
+        for path, name in available:
+            print(f"  - {name} ({path})")
+        raise RuntimeError(
+            "No suitable keyboard devices found. Make sure you have read access to /dev/input/event*"
+        )
+
+    keyboards.sort(key=lambda keyboard: _keyboard_rank(keyboard[0].name, keyboard[1]))
 
     # Return all keyboard devices (not just one) so we can monitor all of them
     keyboard_devices = [dev for dev, _ in keyboards]
@@ -339,286 +581,1959 @@ def _load_evdev_keyboard(key_name):
     return (keyboard_devices, target_key)
 
 
-MODEL_SIZE = CONFIG["model"]
-DEVICE = CONFIG["device"]
-COMPUTE_TYPE = CONFIG["compute_type"]
-AUTO_TYPE = CONFIG["auto_type"]
-NOTIFICATIONS = CONFIG["notifications"]
+class DirectoryWatch:
+    """
+    Minimal inotify watch on one directory, through libc.
 
+    The file descriptor can be registered with epoll; read() returns the
+    (mask, file name) pairs of pending events.
+    """
 
-class Dictation:
-    def __init__(self):
-        self.recording = False
-        self.record_process: Optional[subprocess.Popen[Any]] = None
-        self.temp_file: Optional[Any] = None
-        self.model: Optional[WhisperModel] = None
-        self.model_loaded = threading.Event()
-        self.model_error: Optional[str] = None
-        self.running = True
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    _EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+    def __init__(self, path, mask):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"Cannot watch {path}: {os.strerror(error)}")
+
+    def read(self):
+        events = []
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return events
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            _, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class KeyboardManager:
+    """
+    Monitor keyboard devices from one epoll loop, following hotplug.
 
-        # Check audio backend availability
-        if AUDIO_BACKEND is None:
-            print("ERROR: No audio recording backend found!")
-            print("Please install one of: parecord, pw-record, or arecord")
-            sys.exit(1)
+    All device fds are multiplexed with epoll on the calling thread. An
+    inotify watch on /dev/input adds keyboards that appear later (using the
+    same filtering and ranking as the startup scan) and drops those that
+    disappear, without touching the other devices.
+    """
 
-        # Check clipboard tool availability
-        if CLIPBOARD_TOOL is None:
-            print("ERROR: No clipboard tool found!")
-            print("Please install wl-copy: sudo apt install wl-clipboard")
-            sys.exit(1)
+    INPUT_DIR = "/dev/input"
 
-        # Check typing tool availability if auto-typing is enabled
-        if AUTO_TYPE and TYPING_TOOL is None:
-            print("ERROR: No typing tool found!")
-            print(
-                "Please install one of: wtype (sudo apt install wtype) or dotool (cargo install dotool)"
+    def __init__(self, keyboard_devices, target_key_code, on_key):
+        self.target_key_code = target_key_code
+        self.on_key = on_key
+        self.poller = select.epoll()
+        self.devices = {}  # fd -> InputDevice
+        for device in keyboard_devices:
+            self._add(device)
+
+        self.watch: Optional[DirectoryWatch] = None
+        try:
+            self.watch = DirectoryWatch(
+                self.INPUT_DIR,
+                DirectoryWatch.IN_CREATE
+                | DirectoryWatch.IN_ATTRIB
+                | DirectoryWatch.IN_DELETE
+                | DirectoryWatch.IN_MOVED_TO
+                | DirectoryWatch.IN_MOVED_FROM,
             )
-            sys.exit(1)
+            self.poller.register(self.watch.fd, select.EPOLLIN)
+        except OSError as e:
+            print(f"Warning: keyboard hotplug detection unavailable: {e}")
 
-        # Load model in background
-        print(f"Audio backend: {AUDIO_BACKEND}")
-        print(f"Clipboard tool: {CLIPBOARD_TOOL}")
-        if AUTO_TYPE:
-            print(f"Typing tool: {TYPING_TOOL}")
-        print(f"Loading Whisper model ({MODEL_SIZE})...")
-        threading.Thread(target=self._load_model, daemon=True).start()
+    def _add(self, device):
+        self.poller.register(device.fd, select.EPOLLIN)
+        self.devices[device.fd] = device
 
-    def _load_model(self):
+    def _remove(self, device):
+        self.poller.unregister(device.fd)
+        del self.devices[device.fd]
         try:
-            self.model = WhisperModel(
-                str(MODEL_SIZE), device=str(DEVICE), compute_type=str(COMPUTE_TYPE)
+            device.close()
+        except Exception:
+            pass  # Device may already be gone
+
+    def _handle_hotplug(self):
+        from evdev import InputDevice
+
+        for mask, name in self.watch.read():  # type: ignore[union-attr]
+            if not name.startswith("event"):
+                continue
+            path = os.path.join(self.INPUT_DIR, name)
+            current = next(
+                (dev for dev in self.devices.values() if dev.path == path), None
             )
-            self.model_loaded.set()
-            hotkey_name = str(CONFIG["key"]).upper()
-            print(f"Model loaded. Ready for dictation!")
-            print(f"Hold [{hotkey_name}] to record, release to transcribe.")
-            print("Press Ctrl+C to quit.")
+
+            if mask & (DirectoryWatch.IN_DELETE | DirectoryWatch.IN_MOVED_FROM):
+                if current:
+                    print(f"Keyboard disconnected: {current.name}")
+                    self._remove(current)
+                continue
+            if current:
+                continue
+
+            # Check sysfs first so devices that can't send the key are never opened
+            info = _sysfs_input_device(name)
+            if info is not None and (
+                _sysfs_keyboard_key_count(info, self.target_key_code) is None
+            ):
+                continue
+
+            try:
+                device = InputDevice(path)
+            except OSError:
+                # udev may not have granted access yet; IN_ATTRIB follows when it does
+                continue
+            key_count = _keyboard_key_count(device)
+            if key_count is None:
+                device.close()
+                continue
+            preferred = not _keyboard_rank(device.name, key_count)[0]
+            print(
+                f"Keyboard connected: {device.name}"
+                + (" (preferred)" if preferred else "")
+            )
+            self._add(device)
+
+    def _read_device(self, device):
+        from evdev import ecodes
+
+        try:
+            for event in device.read():
+                # Only the target key matters; drop everything else first
+                if event.code != self.target_key_code:
+                    continue
+                if event.type == ecodes.EV_KEY:
+                    self.on_key(device, event)
+        except BlockingIOError:
+            # Spurious wakeup, nothing to read
+            pass
+        except PermissionError:
+            print(f"ERROR: Permission denied accessing keyboard device: {device.name}")
+            self._remove(device)
+        except OSError as e:
+            print(f"ERROR: Keyboard device error on {device.name}: {e}")
+            self._remove(device)
         except Exception as e:
-            self.model_error = str(e)
-            self.model_loaded.set()
-            print(f"Failed to load model: {e}")
-            if "cudnn" in str(e).lower() or "cuda" in str(e).lower():
-                print(
-                    "Hint: Try setting device = cpu in your config, or install cuDNN."
-                )
+            print(f"ERROR: Unexpected error monitoring {device.name}: {e}")
+
+    def run(self):
+        """Dispatch target key events until interrupted."""
+        while self.devices or self.watch:
+            for fd, mask in self.poller.poll():
+                if self.watch and fd == self.watch.fd:
+                    self._handle_hotplug()
+                elif fd in self.devices:
+                    self._read_device(self.devices[fd])
+        print("ERROR: No keyboard devices left to monitor")
+
+    def close(self):
+        # Close all devices
+        for device in list(self.devices.values()):
+            self._remove(device)
+        if self.watch:
+            self.watch.close()
+        self.poller.close()
+
+
+def stop_recorder_process(process):
+    """Stop a recorder process cleanly, force-killing it if it hangs."""
+    interrupt_recorder_process(process)
+    wait_recorder_process(process)
+
+
+def interrupt_recorder_process(process):
+    """Ask a recorder process to finish, without waiting for it to exit."""
+    # Send SIGINT (like Ctrl+C) to parecord/pw-record for clean termination
+    # This ensures the WAV file header is properly written
+    try:
+        process.send_signal(signal.SIGINT)
+    except (ProcessLookupError, OSError):
+        # Process already terminated
+        pass
 
-    def notify(self, title, message, icon="dialog-information", timeout=2000):
-        """Send a desktop notification."""
-        if not NOTIFICATIONS:
-            return
-        subprocess.run(
-            [
-                "notify-send",
-                "-a",
-                "SoupaWhisper",
-                "-i",
-                icon,
-                "-t",
-                str(timeout),
-                "-h",
-                "string:x-canonical-private-synchronous:soupawhisper",
-                title,
-                message,
-            ],
-            capture_output=True,
-        )
 
-    def start_recording(self):
-        if self.recording or self.model_error:
-            return
+def wait_recorder_process(process):
+    """Wait for an interrupted recorder process, force-killing it if it hangs."""
+    try:
+        process.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        # Force kill if it doesn't stop
+        process.kill()
+        process.wait()
 
-        self.recording = True
-        self.temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        self.temp_file.close()
 
-        # Build command for detected audio backend
-        if AUDIO_COMMAND_BUILDER:
-            command = AUDIO_COMMAND_BUILDER(self.temp_file.name)  # type: ignore[union-attr]
-        else:
-            print("ERROR: Audio command builder not found!")
-            return
+def speech_spans_from_probs(probs, options, total_samples, window=512):
+    """
+    Turn per-window Silero speech probabilities into padded speech spans.
 
-        self.record_process = subprocess.Popen(
-            command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-        # Small delay to ensure audio buffer is ready and first words aren't lost
-        time.sleep(0.05)
-        print(f"Recording with {AUDIO_BACKEND}...")
-        hotkey_name = str(CONFIG["key"]).upper()
-        self.notify(
-            "Recording...",
-            f"Release {hotkey_name} when done",
-            "audio-input-microphone",
-            30000,
-        )
+    Mirrors faster_whisper.vad.get_speech_timestamps (without the maximum
+    speech duration split) so precomputed probabilities give the same
+    spans a full VAD pass over the clip would.
+    """
+    threshold = options.threshold
+    neg_threshold = options.neg_threshold
+    if neg_threshold is None:
+        neg_threshold = max(threshold - 0.15, 0.01)
+    min_speech_samples = SAMPLE_RATE * options.min_speech_duration_ms / 1000
+    min_silence_samples = SAMPLE_RATE * options.min_silence_duration_ms / 1000
+    speech_pad_samples = SAMPLE_RATE * options.speech_pad_ms / 1000
+
+    speeches = []
+    start = None
+    temp_end = 0
+    for i, prob in enumerate(probs):
+        position = window * i
+        if prob >= threshold:
+            temp_end = 0
+            if start is None:
+                start = position
+            continue
+        if start is not None and prob < neg_threshold:
+            if not temp_end:
+                temp_end = position
+            if position - temp_end < min_silence_samples:
+                continue
+            if temp_end - start > min_speech_samples:
+                speeches.append({"start": start, "end": temp_end})
+            start = None
+            temp_end = 0
+
+    if start is not None and total_samples - start > min_speech_samples:
+        speeches.append({"start": start, "end": total_samples})
+
+    # Pad speech, splitting short gaps between neighbours evenly
+    for i, speech in enumerate(speeches):
+        if i == 0:
+            speech["start"] = int(max(0, speech["start"] - speech_pad_samples))
+        if i != len(speeches) - 1:
+            silence = speeches[i + 1]["start"] - speech["end"]
+            if silence < 2 * speech_pad_samples:
+                speech["end"] += int(silence // 2)
+                speeches[i + 1]["start"] = int(
+                    max(0, speeches[i + 1]["start"] - silence // 2)
+                )
+            else:
+                speech["end"] = int(
+                    min(total_samples, speech["end"] + speech_pad_samples)
+                )
+                speeches[i + 1]["start"] = int(
+                    max(0, speeches[i + 1]["start"] - speech_pad_samples)
+                )
+        else:
+            speech["end"] = int(min(total_samples, speech["end"] + speech_pad_samples))
 
-    def stop_recording(self):
-        if not self.recording:
-            return
+    return speeches
 
-        self.recording = False
 
-        if self.record_process:
-            # Send SIGINT (like Ctrl+C) to parecord/pw-record for clean termination
-            # This ensures the WAV file header is properly written
-            try:
-                self.record_process.send_signal(signal.SIGINT)
-            except (ProcessLookupError, OSError):
-                # Process already terminated
-                pass
+def clip_spans(spans, start, end):
+    """Clip sample spans to [start, end) and make them relative to start."""
+    return [
+        {
+            "start": max(span["start"], start) - start,
+            "end": min(span["end"], end) - start,
+        }
+        for span in spans
+        if span["end"] > start and span["start"] < end
+    ]
 
-            # Wait for process to finish (with timeout)
-            try:
-                self.record_process.wait(timeout=2)
-            except subprocess.TimeoutExpired:
-                # Force kill if it doesn't stop
-                self.record_process.kill()
-                self.record_process.wait()
 
-            self.record_process = None
+def collect_speech(audio, spans):
+    """Concatenate the speech spans of audio."""
+    if not spans:
+        return np.empty(0, dtype=np.float32)
+    return np.concatenate([audio[span["start"] : span["end"]] for span in spans])
 
-            # Small delay to ensure file is flushed to disk
-            time.sleep(0.1)
 
-        print("Transcribing...")
-        self.notify(
-            "Transcribing...", "Processing your speech", "emblem-synchronizing", 30000
-        )
+def has_audible_signal(audio, rms_threshold, min_duration_ms):
+    """
+    Cheap pre-check for float32 audio before it is handed to the model.
 
-        # Wait for model if not loaded yet
-        self.model_loaded.wait()
+    False when the clip is shorter than min_duration_ms, or when no 20 ms
+    frame reaches rms_threshold (a fraction of full scale).
+    """
+    if len(audio) < SAMPLE_RATE * min_duration_ms // 1000:
+        return False
+    # The peak bounds every frame's RMS, so quiet clips exit without framing
+    if len(audio) == 0 or np.abs(audio).max() < rms_threshold:
+        return False
+    frame = SAMPLE_RATE // 50
+    usable = len(audio) - len(audio) % frame
+    if usable == 0:
+        return bool(np.sqrt(np.mean(np.square(audio))) >= rms_threshold)
+    frames = audio[:usable].reshape(-1, frame)
+    return bool(np.sqrt(np.mean(np.square(frames), axis=1)).max() >= rms_threshold)
+
+
+class StreamingVad:
+    """
+    Silero VAD run on audio frames as they are captured.
 
-        if self.model_error:
-            print(f"Cannot transcribe: model failed to load")
-            self.notify("Error", "Model failed to load", "dialog-error", 3000)
-            return
+    Speech probabilities are computed on the recorder thread (a few 512-sample
+    windows per chunk), so speech spans for the whole recording are ready the
+    moment the key is released.
+    """
 
-        # Transcribe
-        try:
-            if not self.model or not self.temp_file:
-                print("Error: Model or temp file not initialized")
-                return
+    WINDOW = 512
+    CONTEXT = 64
 
-            # Verify temp file exists and has content
-            temp_file_path = (
-                self.temp_file.name
-                if hasattr(self.temp_file, "name")
-                else str(self.temp_file)
+    def __init__(self):
+        from faster_whisper.vad import get_vad_model
+
+        self.session = get_vad_model().session
+        self.h = np.zeros((1, 1, 128), dtype=np.float32)
+        self.c = np.zeros((1, 1, 128), dtype=np.float32)
+        self.context = np.zeros(self.CONTEXT, dtype=np.float32)
+        self.pending = np.empty(0, dtype=np.float32)
+        self.probs = []
+        self.total_samples = 0
+        self._lock = threading.Lock()
+
+    def feed(self, samples):
+        """Run VAD on every complete window of the int16 samples received so far."""
+        with self._lock:
+            self.total_samples += len(samples)
+            self.pending = np.concatenate(
+                (self.pending, samples.astype(np.float32) / 32768.0)
             )
-            if not os.path.exists(temp_file_path):
-                print(f"Error: Temp file does not exist: {temp_file_path}")
-                self.notify("Error", "Recording file not found", "dialog-error", 3000)
-                return
+            complete = len(self.pending) - len(self.pending) % self.WINDOW
+            if complete:
+                self._process(self.pending[:complete])
+                self.pending = self.pending[complete:]
+
+    def _process(self, audio):
+        # Each window is prefixed with the tail of the previous one, as in
+        # faster_whisper's SileroVADModel, with state carried across calls
+        frames = audio.reshape(-1, self.WINDOW)
+        contexts = np.concatenate((self.context[None, :], frames[:-1, -self.CONTEXT :]))
+        self.context = frames[-1, -self.CONTEXT :].copy()
+        batch = np.concatenate((contexts, frames), axis=1)
+        output, self.h, self.c = self.session.run(
+            None, {"input": batch, "h": self.h, "c": self.c}
+        )
+        self.probs.extend(np.asarray(output).reshape(-1).tolist())
+
+    def flush(self):
+        """Process the final partial window, padded with silence."""
+        with self._lock:
+            if len(self.pending):
+                padded = np.zeros(self.WINDOW, dtype=np.float32)
+                padded[: len(self.pending)] = self.pending
+                self._process(padded)
+                self.pending = np.empty(0, dtype=np.float32)
+
+    def speech_spans(self, options=None):
+        """Return padded speech spans, in samples, for the audio fed so far."""
+        options = options or get_vad_options()
+        with self._lock:
+            probs = list(self.probs)
+            total_samples = self.total_samples
+        return speech_spans_from_probs(probs, options, total_samples, self.WINDOW)
+
+
+class PcmBuffer:
+    """
+    Growable in-memory buffer of 16-bit mono samples.
 
-            file_size = os.path.getsize(temp_file_path)
-            if file_size == 0:
-                print(f"Error: Temp file is empty: {temp_file_path}")
-                self.notify("Error", "Recording file is empty", "dialog-error", 3000)
-                return
+    Storage is preallocated and doubled when full, so appending a chunk from
+    the recorder pipe is a single copy into an existing array. Appended
+    samples are also fed to the optional StreamingVad.
+    """
 
-            print(f"Transcribing {file_size} bytes from {temp_file_path}...")
-            # Configure VAD to be less aggressive and preserve first words
-            vad_options = VadOptions(
-                threshold=0.3,  # Lower = less aggressive (default 0.5)
-                min_silence_duration_ms=100,  # Reduced from default 2000ms to catch speech sooner
-                speech_pad_ms=500,  # Increased padding around speech (default 400ms)
-            )
-            segments, info = self.model.transcribe(
-                temp_file_path,
-                beam_size=5,
-                vad_filter=True,
-                vad_parameters=vad_options,
-            )
+    def __init__(self, initial_seconds=30, vad=None):
+        self._data = np.empty(SAMPLE_RATE * initial_seconds, dtype=np.int16)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.vad: Optional[StreamingVad] = vad
+
+    def __len__(self):
+        return self._size
+
+    def append(self, samples):
+        """Append an int16 sample array."""
+        with self._lock:
+            end = self._size + len(samples)
+            if end > len(self._data):
+                grown = np.empty(max(end, 2 * len(self._data)), dtype=np.int16)
+                grown[: self._size] = self._data[: self._size]
+                self._data = grown
+            self._data[self._size : end] = samples
+            self._size = end
+        if self.vad is not None:
+            self.vad.feed(samples)
+
+    def samples(self):
+        """Return a view of the samples recorded so far."""
+        with self._lock:
+            return self._data[: self._size]
+
+    def to_float32(self):
+        """Return the samples as float32 in [-1, 1), the format Whisper expects."""
+        return self.samples().astype(np.float32) / 32768.0
+
+
+class PipeRecorder:
+    """
+    Run a recorder that writes raw s16le to stdout and stream its samples.
 
-            text = " ".join(segment.text.strip() for segment in segments)
+    A reader thread passes each chunk read from the pipe to on_samples as an
+    int16 array. The recording is complete once stop() returns; interrupt()
+    only asks the recorder to exit, so the wait can happen elsewhere.
+    """
 
-            if text:
-                # Copy to clipboard (Wayland only)
-                process = subprocess.Popen(["wl-copy"], stdin=subprocess.PIPE)
-                process.communicate(input=text.encode())
-
-                # Type it into the active input field
-                if AUTO_TYPE:
-                    result = None
-                    try:
-                        if TYPING_TOOL == "wtype":
-                            result = subprocess.run(
-                                ["wtype", text], capture_output=True, text=True
-                            )
-                        elif TYPING_TOOL == "dotool":
-                            # dotool reads from stdin: echo "type text" | dotool
-                            # First verify dotoold is running
-                            if not is_dotoold_running():
-                                print(
-                                    "ERROR: dotool selected but dotoold daemon is not running."
-                                )
-                                print("Attempting to start dotoold...")
-                                try:
-                                    subprocess.Popen(
-                                        ["dotoold"],
-                                        stdout=subprocess.DEVNULL,
-                                        stderr=subprocess.DEVNULL,
-                                        start_new_session=True,
-                                    )
-                                    time.sleep(0.2)
-                                    if not is_dotoold_running():
-                                        raise RuntimeError(
-                                            "Failed to start dotoold daemon"
-                                        )
-                                except Exception as e:
-                                    print(f"Failed to start dotoold: {e}")
-                                    print("Please start dotoold manually: dotoold &")
-                                    print(
-                                        "Or enable as service: systemctl --user enable --now dotoold"
-                                    )
-                                    raise
-
-                            process = subprocess.Popen(
-                                ["dotool"],
-                                stdin=subprocess.PIPE,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True,
-                            )
-                            stdout, stderr = process.communicate(input=f"type {text}")
-                            result = subprocess.CompletedProcess(
-                                args=["dotool"],
-                                returncode=process.returncode,
-                                stdout=stdout,
-                                stderr=stderr,
-                            )
-
-                        if result is not None and result.returncode != 0:
-                            error_msg = (
-                                result.stderr
-                                if hasattr(result, "stderr")
-                                else str(result)
-                            )
-                            print(f"Typing failed with {TYPING_TOOL}: {error_msg}")
-                            if TYPING_TOOL == "dotool":
-                                if not is_dotoold_running():
-                                    print(
-                                        "Hint: dotoold daemon may have stopped. Try restarting it: dotoold &"
-                                    )
-                    except Exception as e:
-                        print(f"Error while typing: {e}")
-                        if TYPING_TOOL == "dotool":
-                            if not is_dotoold_running():
-                                print(
-                                    "Hint: dotoold daemon is not running. Start it with: dotoold &"
-                                )
-
-                print(f"Copied: {text}")
-                self.notify(
-                    "Copied!",
-                    text[:100] + ("..." if len(text) > 100 else ""),
-                    "emblem-ok-symbolic",
-                    3000,
-                )
-            else:
-                print("No speech detected")
-                self.notify(
+    # 100 ms of 16 kHz mono s16le
+    CHUNK_BYTES = 3200
+
+    def __init__(self, command, on_samples):
+        self.on_samples = on_samples
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0
+        )
+        self.interrupted = False
+        self.thread = threading.Thread(
+            target=self._read_loop, daemon=True, name="RecorderReader"
+        )
+        self.thread.start()
+
+    def _read_loop(self):
+        fd = self.process.stdout.fileno()  # type: ignore[union-attr]
+        leftover = b""
+        while True:
+            try:
+                data = os.read(fd, self.CHUNK_BYTES)
+            except OSError:
+                break
+            if not data:
+                break
+            # Keep an odd trailing byte for the next read so samples stay aligned
+            data = leftover + data
+            leftover = data[len(data) - len(data) % 2 :]
+            data = data[: len(data) - len(leftover)]
+            if data:
+                self.on_samples(np.frombuffer(data, dtype=np.int16))
+
+    def interrupt(self):
+        """Ask the recorder to exit; samples keep arriving until it has."""
+        if not self.interrupted:
+            self.interrupted = True
+            interrupt_recorder_process(self.process)
+
+    def stop(self):
+        """Stop the recorder and wait until all buffered samples are delivered."""
+        self.interrupt()
+        wait_recorder_process(self.process)
+        self.thread.join(timeout=2)
+        if self.process.stdout:
+            self.process.stdout.close()
+
+
+class RingBuffer:
+    """Fixed-size circular buffer holding the most recent int16 samples."""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0  # Total samples ever written
+
+    def write(self, samples):
+        capacity = len(self._data)
+        if len(samples) >= capacity:
+            self.written += len(samples) - capacity
+            samples = samples[-capacity:]
+        start = self.written % capacity
+        first = min(len(samples), capacity - start)
+        self._data[start : start + first] = samples[:first]
+        self._data[: len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def latest(self, count):
+        """Return a copy of the last count samples (fewer if not yet written)."""
+        count = min(count, len(self._data), self.written)
+        start = (self.written - count) % len(self._data)
+        end = start + count
+        if end <= len(self._data):
+            return self._data[start:end].copy()
+        return np.concatenate((self._data[start:], self._data[: end - len(self._data)]))
+
+
+class WarmCapture:
+    """
+    Keep one recorder running and remember the last moments of audio.
+
+    Samples always flow into a pre-roll ring buffer. While a dictation is
+    active they are also appended to its PcmBuffer, which is seeded from the
+    ring on key-down so speech starting with the key press is never clipped.
+    """
+
+    # Extra ring capacity that absorbs the delay between key press and handling
+    SLACK_MS = 1000
+
+    def __init__(self, command, preroll_ms, hold_ms=0):
+        self.command = command
+        self.preroll_samples = SAMPLE_RATE * preroll_ms // 1000
+        # hold_ms: how long after the key press a dictation may be seeded
+        ring_ms = preroll_ms + hold_ms + self.SLACK_MS
+        self.ring = RingBuffer(SAMPLE_RATE * ring_ms // 1000)
+        self.target: Optional[PcmBuffer] = None
+        # Wall-clock time the newest chunk arrived, comparable to evdev timestamps
+        self.last_chunk_time = 0.0
+        self._lock = threading.Lock()
+        self._chunk_arrived = threading.Condition(self._lock)
+        self.recorder = PipeRecorder(command, self._on_samples)
+
+    def _on_samples(self, samples):
+        with self._lock:
+            self.ring.write(samples)
+            self.last_chunk_time = time.time()
+            if self.target is not None:
+                self.target.append(samples)
+            self._chunk_arrived.notify_all()
+
+    def begin(self, target, event_time=None):
+        """Start filling target, seeded with the pre-roll before event_time."""
+        if self.recorder.process.poll() is not None:
+            print("Warm capture recorder exited, restarting it...")
+            self.recorder = PipeRecorder(self.command, self._on_samples)
+
+        with self._lock:
+            count = self.preroll_samples
+            if event_time is not None and self.last_chunk_time:
+                # Audio captured between the key press and now also belongs to it
+                lag = max(0.0, self.last_chunk_time - event_time)
+                count += int(lag * SAMPLE_RATE)
+            target.append(self.ring.latest(count))
+            self.target = target
+
+    def end(self, event_time=None):
+        """Stop filling the active buffer once audio up to event_time has arrived."""
+        deadline = time.time() + 0.5
+        with self._lock:
+            release_time = event_time if event_time is not None else time.time()
+            while self.last_chunk_time < release_time and time.time() < deadline:
+                self._chunk_arrived.wait(timeout=deadline - time.time())
+            target = self.target
+            self.target = None
+        return target
+
+    def close(self):
+        self.recorder.stop()
+
+
+class IncrementalTranscriber:
+    """
+    Transcribe finished speech regions while the hotkey is still held.
+
+    A background thread periodically runs VAD over the audio that has not
+    been transcribed yet. Everything up to the end of a speech region that is
+    followed by a long enough pause is decoded and its text held, so on
+    release only the unfinished tail is left to decode.
+    """
+
+    CHECK_INTERVAL = 1.0  # Seconds between VAD passes
+    MIN_CHUNK_SECONDS = 2  # Don't bother decoding shorter regions on their own
+
+    def __init__(self, buffer, transcribe):
+        from faster_whisper.vad import VadOptions
+
+        # A pause this long ends a region; shorter ones may be mid-sentence
+        self.vad_options = VadOptions(
+            threshold=0.3, min_silence_duration_ms=500, speech_pad_ms=200
+        )
+        self.buffer = buffer
+        self.transcribe = transcribe
+        self.texts = []
+        self.committed = 0  # Samples already transcribed
+        self._finished = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, daemon=True, name="IncrementalTranscriber"
+        )
+        self.thread.start()
+
+    def _run(self):
+        while not self._finished.wait(self.CHECK_INTERVAL):
+            try:
+                self._transcribe_finished_region()
+            except Exception as e:
+                print(f"Incremental transcription error: {e}")
+
+    def _find_cut(self, audio):
+        """Return the sample offset ending the last completed speech region."""
+        if self.buffer.vad is not None:
+            speeches = clip_spans(
+                self.buffer.vad.speech_spans(self.vad_options),
+                self.committed,
+                self.committed + len(audio),
+            )
+        else:
+            from faster_whisper.vad import get_speech_timestamps
+
+            speeches = get_speech_timestamps(audio, self.vad_options)
+        if not speeches:
+            return 0
+        # The last region may still be in progress unless a full pause follows it
+        pause_samples = SAMPLE_RATE * self.vad_options.min_silence_duration_ms // 1000
+        if len(audio) - speeches[-1]["end"] >= pause_samples:
+            return speeches[-1]["end"]
+        if len(speeches) > 1:
+            return speeches[-2]["end"]
+        return 0
+
+    def _transcribe_finished_region(self):
+        samples = self.buffer.samples()[self.committed :]
+        if len(samples) < SAMPLE_RATE * self.MIN_CHUNK_SECONDS:
+            return
+
+        audio = samples.astype(np.float32) / 32768.0
+        cut = self._find_cut(audio)
+        if cut < SAMPLE_RATE * self.MIN_CHUNK_SECONDS:
+            return
+
+        speech = None
+        if self.buffer.vad is not None:
+            speech = clip_spans(
+                self.buffer.vad.speech_spans(), self.committed, self.committed + cut
+            )
+        text = self.transcribe(audio[:cut], speech)
+        if text is None:
+            # Model not ready yet; the region is picked up again next pass
+            return
+        if text:
+            self.texts.append(text)
+        self.committed += cut
+        print(f"Transcribed {cut / SAMPLE_RATE:.1f}s while recording")
+
+    def finish(self):
+        """Stop and return the held texts and the number of samples they cover."""
+        self._finished.set()
+        self.thread.join()
+        return self.texts, self.committed
+
+
+class LocalAgreementStreamer:
+    """
+    Type text while the user is still talking (local-agreement policy).
+
+    The untyped part of the recording is re-decoded periodically with word
+    timestamps. Words on which two consecutive hypotheses agree are stable:
+    they are typed and the audio behind them is trimmed, so each re-decode
+    only covers the last few seconds.
+    """
+
+    MIN_DECODE_SECONDS = 1
+    # Without agreement for this long, commit all but the last few words
+    MAX_BUFFER_SECONDS = 15
+    FORCE_KEEP_WORDS = 3
+    PROMPT_CHARS = 200  # Typed text passed back as context for the next decode
+
+    def __init__(self, buffer, transcribe_words, type_text, interval_ms):
+        self.buffer = buffer
+        self.transcribe_words = transcribe_words
+        self.type_text = type_text
+        self.interval = interval_ms / 1000
+        self.typed = ""  # Text already typed into the focused window
+        self.pending = ""  # Committed text waiting until typing is allowed
+        self.committed = 0  # Samples covered by committed words
+        self.previous = []  # Last hypothesis for the uncommitted audio
+        self._finished = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, daemon=True, name="LocalAgreementStreamer"
+        )
+        self.thread.start()
+
+    def _run(self):
+        while not self._finished.wait(self.interval):
+            try:
+                self._decode_and_commit()
+            except Exception as e:
+                print(f"Live transcription error: {e}")
+
+    def _decode_and_commit(self):
+        samples = self.buffer.samples()[self.committed :]
+        if len(samples) < SAMPLE_RATE * self.MIN_DECODE_SECONDS:
+            return
+
+        audio = samples.astype(np.float32) / 32768.0
+        words = self.transcribe_words(
+            audio, (self.typed + self.pending)[-self.PROMPT_CHARS :]
+        )
+        if words is None:
+            # Model not ready yet
+            return
+
+        # Commit the longest prefix both hypotheses agree on
+        agreed = 0
+        for (word, _), (previous, _) in zip(words, self.previous):
+            if word.strip() != previous.strip():
+                break
+            agreed += 1
+        if agreed == 0 and len(samples) > SAMPLE_RATE * self.MAX_BUFFER_SECONDS:
+            agreed = max(0, len(words) - self.FORCE_KEEP_WORDS)
+
+        if agreed:
+            self.pending += "".join(word for word, _ in words[:agreed])
+            self.committed += int(words[agreed - 1][1] * SAMPLE_RATE)
+        self.previous = words[agreed:]
+        self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        text = self.pending if self.typed else self.pending.lstrip()
+        if self.type_text(text):
+            self.typed += text
+            self.pending = ""
+
+    def finish(self):
+        """
+        Stop streaming and return the committed texts and the samples they cover.
+
+        The committed text starts with self.typed; the rest is left to the caller.
+        """
+        self._finished.set()
+        self.thread.join()
+        text = (self.typed + self.pending).strip()
+        return [text] if text else [], self.committed
+
+
+class DBusMessageWriter:
+    """Little-endian D-Bus wire format marshalling for the few types we send."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def align(self, boundary):
+        self.data += b"\0" * (-len(self.data) % boundary)
+
+    def byte(self, value):
+        self.data += struct.pack("<B", value)
+
+    def uint32(self, value):
+        self.align(4)
+        self.data += struct.pack("<I", value)
+
+    def int32(self, value):
+        self.align(4)
+        self.data += struct.pack("<i", value)
+
+    def string(self, value):
+        encoded = value.encode()
+        self.uint32(len(encoded))
+        self.data += encoded + b"\0"
+
+    def signature(self, value):
+        encoded = value.encode()
+        self.byte(len(encoded))
+        self.data += encoded + b"\0"
+
+    def variant(self, signature, value):
+        self.signature(signature)
+        {"s": self.string, "o": self.string, "g": self.signature, "u": self.uint32}[
+            signature
+        ](value)
+
+    def array(self, items, write_item, item_alignment):
+        """Write an array; write_item is called for each item."""
+        self.uint32(0)
+        length_offset = len(self.data) - 4
+        # Padding before the first item doesn't count towards the length
+        self.align(item_alignment)
+        start = len(self.data)
+        for item in items:
+            write_item(item)
+        struct.pack_into("<I", self.data, length_offset, len(self.data) - start)
+
+
+class DBusConnection:
+    """
+    Minimal blocking client for the D-Bus session bus.
+
+    Implements just enough of the protocol to authenticate, say Hello and
+    make method calls: no introspection, signals or other bus features.
+    Socket operations time out after timeout seconds (socket.timeout, an
+    OSError), so a hung bus or notification server can't block forever.
+    """
+
+    METHOD_CALL = 1
+    METHOD_RETURN = 2
+    ERROR = 3
+
+    def __init__(self, address=None, timeout=5.0):
+        address = address or os.environ.get("DBUS_SESSION_BUS_ADDRESS")
+        if not address:
+            address = f"unix:path={os.environ.get('XDG_RUNTIME_DIR', f'/run/user/{os.getuid()}')}/bus"
+        self.sock = self._connect(address, timeout)
+        self.serial = 0
+        self.buffer = b""
+        self._authenticate()
+        self.call(
+            "org.freedesktop.DBus",
+            "/org/freedesktop/DBus",
+            "org.freedesktop.DBus",
+            "Hello",
+        )
+
+    @staticmethod
+    def _connect(address, timeout):
+        error: Optional[Exception] = None
+        for entry in address.split(";"):
+            transport, _, params = entry.partition(":")
+            if transport != "unix":
+                continue
+            options = dict(p.split("=", 1) for p in params.split(",") if "=" in p)
+            if "path" in options:
+                target = options["path"]
+            elif "abstract" in options:
+                target = "\0" + options["abstract"]
+            else:
+                continue
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(target)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+        raise OSError(f"Cannot connect to session bus at {address}: {error}")
+
+    def _authenticate(self):
+        uid = str(os.getuid()).encode().hex()
+        self.sock.sendall(b"\0AUTH EXTERNAL " + uid.encode() + b"\r\n")
+        reply = b""
+        while not reply.endswith(b"\r\n"):
+            chunk = self.sock.recv(256)
+            if not chunk:
+                raise OSError("Session bus closed the connection during auth")
+            reply += chunk
+        if not reply.startswith(b"OK "):
+            raise OSError(f"Session bus rejected authentication: {reply!r}")
+        self.sock.sendall(b"BEGIN\r\n")
+
+    def _recv_exact(self, size):
+        while len(self.buffer) < size:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise OSError("Session bus closed the connection")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _read_message(self):
+        """Read one message; return (type, reply serial, error name, body)."""
+        fixed = self._recv_exact(16)
+        order = "<" if fixed[0:1] == b"l" else ">"
+        message_type = fixed[1]
+        body_length, _, fields_length = struct.unpack(order + "III", fixed[4:16])
+        fields = self._recv_exact(fields_length + (-(16 + fields_length) % 8))
+        body = self._recv_exact(body_length)
+
+        reply_serial = None
+        error_name = None
+        offset = 0
+        while offset < fields_length:
+            offset += -offset % 8  # Each field is a struct
+            code = fields[offset]
+            signature_length = fields[offset + 1]
+            signature = fields[offset + 2 : offset + 2 + signature_length].decode()
+            # Field offsets are relative to a header that starts 16 bytes earlier
+            offset += 3 + signature_length
+            if signature == "g":
+                value_length = fields[offset]
+                value = fields[offset + 1 : offset + 1 + value_length].decode()
+                offset += value_length + 2
+            else:
+                offset += -(16 + offset) % 4
+                (number,) = struct.unpack_from(order + "I", fields, offset)
+                offset += 4
+                if signature in ("s", "o"):
+                    value = fields[offset : offset + number].decode()
+                    offset += number + 1
+                else:
+                    value = number
+            if code == 4:
+                error_name = value
+            elif code == 5:
+                reply_serial = value
+        return message_type, reply_serial, error_name, body
+
+    def call(self, destination, path, interface, member, signature="", body=b""):
+        """Call a method and return the raw little-endian reply body."""
+        self.serial += 1
+        fields = [
+            (1, "o", path),
+            (2, "s", interface),
+            (3, "s", member),
+            (6, "s", destination),
+        ]
+        if signature:
+            fields.append((8, "g", signature))
+
+        header = DBusMessageWriter()
+        header.data += struct.pack(
+            "<cBBBII", b"l", self.METHOD_CALL, 0, 1, len(body), self.serial
+        )
+
+        def write_field(field):
+            header.align(8)
+            code, field_signature, value = field
+            header.byte(code)
+            header.variant(field_signature, value)
+
+        header.array(fields, write_field, 8)
+        header.align(8)
+        self.sock.sendall(bytes(header.data) + body)
+
+        while True:
+            message_type, reply_serial, error_name, reply = self._read_message()
+            if reply_serial != self.serial:
+                # Signals such as NameAcquired are not interesting here
+                continue
+            if message_type == self.ERROR:
+                raise OSError(f"D-Bus call {member} failed: {error_name}")
+            return reply
+
+    def close(self):
+        self.sock.close()
+
+
+class Notifier:
+    """
+    Send desktop notifications from a background thread.
+
+    Notifications go to org.freedesktop.Notifications over the session bus.
+    Each one replaces the previous notification, and rapid updates are
+    coalesced so only the newest pending one is sent. When the bus is not
+    reachable, notify-send is run instead, still off the caller's thread.
+    """
+
+    def __init__(self):
+        self.pending = None
+        self.replaces_id = 0
+        self.connection: Optional[DBusConnection] = None
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True, name="Notifier").start()
+
+    def notify(self, title, message, icon, timeout):
+        """Queue a notification, replacing any that hasn't been sent yet."""
+        with self._condition:
+            self.pending = (title, message, icon, timeout)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self.pending is None:
+                    self._condition.wait()
+                notification, self.pending = self.pending, None
+            try:
+                self._send_dbus(*notification)
+            except Exception:
+                # Reconnect next time; meanwhile fall back to notify-send
+                if self.connection:
+                    self.connection.close()
+                    self.connection = None
+                try:
+                    self._send_notify_send(*notification)
+                except OSError as e:
+                    # notify-send missing or failing: drop this notification
+                    print(f"Warning: could not send notification: {e}")
+
+    def _send_dbus(self, title, message, icon, timeout):
+        if self.connection is None:
+            self.connection = DBusConnection()
+
+        body = DBusMessageWriter()
+        body.string("SoupaWhisper")
+        body.uint32(self.replaces_id)
+        body.string(icon)
+        body.string(title)
+        body.string(message)
+        body.array([], body.string, 4)  # No actions
+
+        def write_hint(hint):
+            body.align(8)
+            body.string(hint[0])
+            body.variant("s", hint[1])
+
+        body.array([("x-canonical-private-synchronous", "soupawhisper")], write_hint, 8)
+        body.int32(timeout)
+
+        reply = self.connection.call(
+            "org.freedesktop.Notifications",
+            "/org/freedesktop/Notifications",
+            "org.freedesktop.Notifications",
+            "Notify",
+            "susssasa{sv}i",
+            bytes(body.data),
+        )
+        (self.replaces_id,) = struct.unpack_from("<I", reply)
+
+    @staticmethod
+    def _send_notify_send(title, message, icon, timeout):
+        subprocess.run(
+            [
+                "notify-send",
+                "-a",
+                "SoupaWhisper",
+                "-i",
+                icon,
+                "-t",
+                str(timeout),
+                "-h",
+                "string:x-canonical-private-synchronous:soupawhisper",
+                title,
+                message,
+            ],
+            capture_output=True,
+        )
+
+
+def dotool_commands(text):
+    """
+    Translate text into dotool command lines.
+
+    dotool reads one command per line, so newlines in the text become
+    "key enter" commands instead of ending the "type" command early.
+    """
+    commands = []
+    for index, line in enumerate(text.replace("\r\n", "\n").split("\n")):
+        if index:
+            commands.append("key enter")
+        line = line.replace("\r", "")
+        if line:
+            commands.append(f"type {line}")
+    return "".join(f"{command}\n" for command in commands)
+
+
+class DotoolSession:
+    """
+    A long-lived dotool process fed commands over its stdin.
+
+    Spawning dotool per dictation costs a fork/exec and a new virtual
+    keyboard that the compositor has to pick up before keys land. Keeping
+    one process open makes typing start as soon as the command is written.
+    A broken pipe means dotool died; it is restarted and the write retried.
+    """
+
+    def __init__(self, command=("dotool",)):
+        self.command = list(command)
+        self.process: Optional[subprocess.Popen[bytes]] = None
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+
+    def start(self):
+        """Start dotool now, so its virtual keyboard exists before typing."""
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self._start()
+
+    def _write(self, data):
+        if self.process is None or self.process.poll() is not None:
+            self._start()
+        assert self.process is not None and self.process.stdin is not None
+        self.process.stdin.write(data)
+
+    def send(self, commands):
+        """Write command lines, restarting dotool once if the pipe broke."""
+        data = commands.encode()
+        with self.lock:
+            try:
+                self._write(data)
+            except (BrokenPipeError, OSError):
+                self._stop()
+                print("dotool session ended, reconnecting...")
+                self._write(data)
+
+    def type(self, text):
+        self.send(dotool_commands(text))
+
+    def _stop(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.stdin:
+                self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+    def close(self):
+        with self.lock:
+            self._stop()
+
+
+def _keymap_rows(rows):
+    """Build a keymap from (unshifted, shifted, key name) rows."""
+    keymap = {}
+    for unshifted, shifted, key in rows:
+        keymap[unshifted] = (key, ())
+        if shifted:
+            keymap[shifted] = (key, ("KEY_LEFTSHIFT",))
+    return keymap
+
+
+_US_ROWS = [(c, c.upper(), f"KEY_{c.upper()}") for c in "abcdefghijklmnopqrstuvwxyz"]
+_US_ROWS += [
+    (digit, shifted, f"KEY_{digit}")
+    for digit, shifted in zip("1234567890", "!@#$%^&*()")
+]
+_US_ROWS += [
+    ("-", "_", "KEY_MINUS"),
+    ("=", "+", "KEY_EQUAL"),
+    ("[", "{", "KEY_LEFTBRACE"),
+    ("]", "}", "KEY_RIGHTBRACE"),
+    ("\\", "|", "KEY_BACKSLASH"),
+    (";", ":", "KEY_SEMICOLON"),
+    ("'", '"', "KEY_APOSTROPHE"),
+    ("`", "~", "KEY_GRAVE"),
+    (",", "<", "KEY_COMMA"),
+    (".", ">", "KEY_DOT"),
+    ("/", "?", "KEY_SLASH"),
+    (" ", None, "KEY_SPACE"),
+    ("\n", None, "KEY_ENTER"),
+    ("\t", None, "KEY_TAB"),
+]
+
+# Character -> (key name, modifier key names), matching the keyboard layout
+# the compositor applies to the virtual keyboard
+KEYMAPS = {
+    "us": _keymap_rows(_US_ROWS),
+    "gb": _keymap_rows(
+        [row for row in _US_ROWS if row[2] not in ("KEY_2", "KEY_3", "KEY_APOSTROPHE")]
+        + [
+            ("2", '"', "KEY_2"),
+            ("3", "£", "KEY_3"),
+            ("'", "@", "KEY_APOSTROPHE"),
+            ("#", "~", "KEY_BACKSLASH"),
+            ("\\", "|", "KEY_102ND"),
+            ("`", "¬", "KEY_GRAVE"),
+        ]
+    ),
+}
+
+# Typographic characters Whisper likes to emit, typed as their ASCII forms
+TYPOGRAPHIC_REPLACEMENTS = str.maketrans(
+    {
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+        "\u2013": "-",
+        "\u2014": "-",
+        "\u2026": "...",
+        "\u00a0": " ",
+        "\r": None,
+    }
+)
+
+
+class UInputTyper:
+    """
+    Type text through a virtual keyboard created with evdev's UInput.
+
+    The device is created once and kept, so typing needs no external tools
+    and no process per dictation. Each keystroke is one press frame (the
+    modifiers and the key, then a single syn) and one release frame.
+    uinput_factory takes the key capabilities and returns the UInput-like
+    sink to write to, which lets a mock stand in for /dev/uinput.
+    """
+
+    DEVICE_NAME = "SoupaWhisper virtual keyboard"
+
+    def __init__(self, keymap="us", key_delay_ms=2, uinput_factory=None, extra_keys=()):
+        from evdev import ecodes
+
+        if keymap not in KEYMAPS:
+            raise ValueError(
+                f"Unknown keymap '{keymap}' (available: {', '.join(sorted(KEYMAPS))})"
+            )
+        self.ecodes = ecodes
+        self.keymap = {
+            char: (
+                ecodes.ecodes[key],
+                tuple(ecodes.ecodes[modifier] for modifier in modifiers),
+            )
+            for char, (key, modifiers) in KEYMAPS[keymap].items()
+        }
+        self.key_delay = key_delay_ms / 1000
+        codes = {code for code, _ in self.keymap.values()}
+        codes.update(m for _, modifiers in self.keymap.values() for m in modifiers)
+        codes.update(self.codes(extra_keys))
+        if uinput_factory is None:
+            uinput_factory = self._create_uinput
+        self.device = uinput_factory({ecodes.EV_KEY: sorted(codes)})
+        self.lock = threading.Lock()
+
+    @classmethod
+    def _create_uinput(cls, capabilities):
+        from evdev import UInput
+
+        return UInput(capabilities, name=cls.DEVICE_NAME)
+
+    def codes(self, key_names):
+        """Return the key codes for evdev key names such as KEY_LEFTCTRL."""
+        try:
+            return [self.ecodes.ecodes[name] for name in key_names]
+        except KeyError as e:
+            raise ValueError(f"Unknown key {e.args[0]}") from None
+
+    def _frame(self, codes, value):
+        for code in codes:
+            self.device.write(self.ecodes.EV_KEY, code, value)
+        self.device.syn()
+
+    def press(self, code, modifiers=()):
+        """Press and release a key with the given modifier keys held."""
+        self._frame([*modifiers, code], 1)
+        self._frame([code, *reversed(modifiers)], 0)
+        if self.key_delay:
+            time.sleep(self.key_delay)
+
+    def can_type(self, text):
+        """Whether the keymap can produce every character of text."""
+        return all(
+            char in self.keymap for char in text.translate(TYPOGRAPHIC_REPLACEMENTS)
+        )
+
+    def type(self, text):
+        """Type text; characters the keymap can't produce are skipped."""
+        skipped = set()
+        with self.lock:
+            for char in text.translate(TYPOGRAPHIC_REPLACEMENTS):
+                key = self.keymap.get(char)
+                if key is None:
+                    skipped.add(char)
+                    continue
+                self.press(*key)
+        if skipped:
+            print(f"Could not type characters: {''.join(sorted(skipped))}")
+
+    def close(self):
+        self.device.close()
+
+
+# Modifier names accepted in key chords such as paste_keys = ctrl+shift+v
+CHORD_MODIFIERS = {
+    "ctrl": ("ctrl", "KEY_LEFTCTRL"),
+    "shift": ("shift", "KEY_LEFTSHIFT"),
+    "alt": ("alt", "KEY_LEFTALT"),
+    "super": ("logo", "KEY_LEFTMETA"),
+}
+
+
+def parse_chord(chord):
+    """Split a chord like "ctrl+v" into (modifier names, key name)."""
+    names = [name.strip().lower() for name in chord.split("+") if name.strip()]
+    if not names:
+        raise ValueError(f"Empty key chord '{chord}'")
+    modifiers, key = names[:-1], names[-1]
+    for modifier in modifiers:
+        if modifier not in CHORD_MODIFIERS:
+            raise ValueError(
+                f"Unknown modifier '{modifier}' in '{chord}' "
+                f"(use {', '.join(CHORD_MODIFIERS)})"
+            )
+    return modifiers, key
+
+
+class OutputManager:
+    """Copy text to the clipboard and type or paste it into the active window."""
+
+    def __init__(self, typing_tool, config=None):
+        config = config or get_config()
+        self.typing_tool = typing_tool
+        self.paste_modifiers, self.paste_key = parse_chord(config["paste_keys"])
+        self.dotool: Optional[DotoolSession] = None
+        self.uinput: Optional[UInputTyper] = None
+        if typing_tool == "uinput":
+            self.uinput = UInputTyper(
+                config["keymap"],
+                config["key_delay_ms"],
+                extra_keys=self._uinput_paste_keys(),
+            )
+        if typing_tool == "dotool":
+            self.dotool = DotoolSession()
+            # Start now so the virtual keyboard exists before the first dictation
+            try:
+                self.dotool.start()
+            except OSError as e:
+                print(f"Failed to start dotool: {e}")
+
+    def copy(self, text):
+        """Copy text to the clipboard (Wayland only)."""
+        process = subprocess.Popen(["wl-copy"], stdin=subprocess.PIPE)
+        process.communicate(input=text.encode())
+        if process.returncode != 0:
+            raise RuntimeError(f"wl-copy exited with status {process.returncode}")
+
+    def _uinput_paste_keys(self):
+        return [CHORD_MODIFIERS[m][1] for m in self.paste_modifiers] + [
+            f"KEY_{self.paste_key.upper()}"
+        ]
+
+    def paste(self):
+        """Send the paste chord, so the clipboard lands in one step."""
+        try:
+            if self.typing_tool == "wtype":
+                command = ["wtype"]
+                for modifier in self.paste_modifiers:
+                    command += ["-M", CHORD_MODIFIERS[modifier][0]]
+                # wtype takes XKB keysym names: v, Insert, ...
+                key = (
+                    self.paste_key
+                    if len(self.paste_key) == 1
+                    else self.paste_key.capitalize()
+                )
+                command += ["-k", key]
+                for modifier in reversed(self.paste_modifiers):
+                    command += ["-m", CHORD_MODIFIERS[modifier][0]]
+                result = subprocess.run(command, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Pasting failed with wtype: {result.stderr}")
+            elif self.dotool is not None:
+                self.dotool.send(
+                    f"key {'+'.join([*self.paste_modifiers, self.paste_key])}\n"
+                )
+            elif self.uinput is not None:
+                *modifiers, key = self.uinput.codes(self._uinput_paste_keys())
+                self.uinput.press(key, tuple(modifiers))
+        except Exception as e:
+            print(f"Error while pasting: {e}")
+
+    def can_type(self, text):
+        """Whether type_text can type text key by key, rather than pasting it."""
+        return self.uinput is None or self.uinput.can_type(text)
+
+    def type_text(self, text):
+        """
+        Type text into the active input field.
+
+        The uinput keyboard can only type its keymap's characters, so text
+        with others (é, ü, €, ...) is copied to the clipboard and pasted.
+        """
+        try:
+            if self.typing_tool == "wtype":
+                result = subprocess.run(["wtype", text], capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"Typing failed with wtype: {result.stderr}")
+            elif self.dotool is not None:
+                self.dotool.type(text)
+            elif self.uinput is not None and not self.uinput.can_type(text):
+                self.copy(text)
+                self.paste()
+            elif self.uinput is not None:
+                self.uinput.type(text)
+        except Exception as e:
+            print(f"Error while typing: {e}")
+            if self.typing_tool == "dotool" and not os.access("/dev/uinput", os.W_OK):
+                print(
+                    "Hint: dotool needs write access to /dev/uinput "
+                    "(are you in the input group?)"
+                )
+
+    def close(self):
+        if self.dotool is not None:
+            self.dotool.close()
+        if self.uinput is not None:
+            self.uinput.close()
+
+
+class OutputStage:
+    """
+    Run output sinks (clipboard, typing, notification) concurrently.
+
+    A sink can be ordered after others, e.g. paste after clipboard; it is
+    skipped if one of those failed. run() returns each sink's completion
+    time in milliseconds since the stage started.
+    """
+
+    def __init__(self):
+        self.sinks = []
+
+    def add(self, name, action, after=()):
+        self.sinks.append((name, action, tuple(after)))
+
+    def run(self):
+        start = time.perf_counter()
+        done = {name: threading.Event() for name, _, _ in self.sinks}
+        failed = set()
+        timings = {}
+
+        def run_sink(name, action, after):
+            try:
+                for dependency in after:
+                    done[dependency].wait()
+                skipped = failed.intersection(after)
+                if skipped:
+                    failed.add(name)
+                    print(f"Skipped {name}: {', '.join(sorted(skipped))} failed")
+                    return
+                action()
+            except Exception as e:
+                failed.add(name)
+                print(f"Output to {name} failed: {e}")
+            finally:
+                timings[name] = (time.perf_counter() - start) * 1000
+                done[name].set()
+
+        threads = [
+            threading.Thread(target=run_sink, args=sink, name=f"Output-{sink[0]}")
+            for sink in self.sinks
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {name: timings[name] for name, _, _ in self.sinks}
+
+
+@dataclass
+class TranscriptionJob:
+    """
+    A finished recording waiting for the transcription worker.
+
+    Its recorder has only been interrupted; finish_recording() waits for it
+    to exit, so the key handler never waits on the recorder process.
+    """
+
+    audio: Optional[np.ndarray] = None  # float32 samples (pipe capture)
+    path: Optional[str] = None  # WAV file (file capture)
+    incremental: Optional[IncrementalTranscriber] = None
+    live: Optional[LocalAgreementStreamer] = None
+    vad: Optional[StreamingVad] = None  # Speech probabilities computed while recording
+    created: float = field(default_factory=time.monotonic)
+    # Pipe capture: samples still arriving until the recorder has exited
+    buffer: Optional[PcmBuffer] = None
+    recorder: Optional[PipeRecorder] = None
+    record_process: Optional[subprocess.Popen[Any]] = None  # File capture
+
+    def finish_recording(self):
+        """Wait for the recorder to exit and collect the complete recording."""
+        if self.recorder:
+            # The reader thread has drained the pipe once stop() returns
+            self.recorder.stop()
+            self.recorder = None
+        if self.record_process:
+            stop_recorder_process(self.record_process)
+            self.record_process = None
+        if self.buffer is not None:
+            self.audio = self.buffer.to_float32()
+            self.vad = self.buffer.vad
+            self.buffer = None
+
+    def cleanup(self):
+        """Stop background transcription and remove the temporary WAV file, if any."""
+        if self.incremental:
+            self.incremental.finish()
+        if self.live:
+            self.live.finish()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class Dictation:
+    def __init__(self):
+        self.config = get_config()
+        self.audio_backend, self.audio_command_builder = get_audio_backend()
+        self.clipboard_tool = get_clipboard_tool()
+        # Only probe for a typing tool when it is used
+        self.typing_tool = get_typing_tool() if self.config["auto_type"] else None
+        self.recording = False
+        self.record_process: Optional[subprocess.Popen[Any]] = None
+        self.temp_file: Optional[Any] = None
+        self.recorder: Optional[PipeRecorder] = None
+        self.audio: Optional[PcmBuffer] = None
+        self.warm_capture: Optional[WarmCapture] = None
+        self.incremental: Optional[IncrementalTranscriber] = None
+        self.live: Optional[LocalAgreementStreamer] = None
+        self.pending_press: Optional[threading.Timer] = None
+        self.key_lock = threading.Lock()
+        self.jobs: "queue.Queue[TranscriptionJob]" = queue.Queue()
+        self.model: Optional[ModelScheduler | RemoteModel] = None
+        self.model_loaded = threading.Event()
+        self.model_error: Optional[str] = None
+        self.running = True
+        self.notifier: Optional[Notifier] = None
+
+        # Check audio backend availability
+        if self.audio_backend is None:
+            print("ERROR: No audio recording backend found!")
+            print("Please install one of: parecord, pw-record, or arecord")
+            sys.exit(1)
+
+        if self.config["capture"] not in ("pipe", "file"):
+            print(f"ERROR: Unknown audio capture mode: {self.config['capture']}")
+            print("Please set capture to 'pipe' or 'file' in the [audio] section")
+            sys.exit(1)
+
+        if self.config["warm_capture"] and self.config["capture"] != "pipe":
+            print("ERROR: warm_capture requires capture = pipe")
+            sys.exit(1)
+
+        if self.config["incremental"] and self.config["capture"] != "pipe":
+            print("ERROR: incremental transcription requires capture = pipe")
+            sys.exit(1)
+
+        if self.config["live_typing"] and (
+            self.config["capture"] != "pipe" or not self.config["auto_type"]
+        ):
+            print("ERROR: live_typing requires capture = pipe and auto_type = true")
+            sys.exit(1)
+
+        if self.config["live_typing"] and self.config["incremental"]:
+            print("ERROR: live_typing and incremental cannot be enabled together")
+            sys.exit(1)
+
+        # Check clipboard tool availability
+        if self.clipboard_tool is None:
+            print("ERROR: No clipboard tool found!")
+            print("Please install wl-copy: sudo apt install wl-clipboard")
+            sys.exit(1)
+
+        # Check typing tool availability if auto-typing is enabled
+        if self.config["auto_type"] and self.typing_tool is None:
+            print("ERROR: No typing tool found!")
+            print(
+                "Please install one of: wtype (sudo apt install wtype) or dotool (cargo install dotool),"
+            )
+            print("or set typing_tool = uinput to type through /dev/uinput")
+            sys.exit(1)
+
+        # Load model in background
+        print(f"Audio backend: {self.audio_backend} ({self.config['capture']} capture)")
+        print(f"Clipboard tool: {self.clipboard_tool}")
+        if self.config["auto_type"]:
+            print(f"Typing tool: {self.typing_tool}")
+        try:
+            self.output = OutputManager(self.typing_tool, self.config)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Could not set up typing with {self.typing_tool}: {e}")
+            sys.exit(1)
+        if self.config["warm_capture"] and self.audio_command_builder:
+            print(f"Warm capture enabled ({self.config['preroll_ms']} ms pre-roll)")
+            self.warm_capture = WarmCapture(
+                self.audio_command_builder(),
+                self.config["preroll_ms"],
+                self.config["min_hold_ms"],
+            )
+        print(f"Loading Whisper model ({self.config['model']})...")
+        threading.Thread(target=self._load_model, daemon=True).start()
+        threading.Thread(
+            target=self._transcription_worker, daemon=True, name="TranscriptionWorker"
+        ).start()
+
+    def _load_model(self):
+        try:
+            if self.config["use_daemon"]:
+                self.model = self._connect_daemon()
+            if self.model is None:
+                self.model = ModelScheduler(
+                    load_whisper_model(self.config),
+                    self.config["batch_window_ms"],
+                    self.config["max_batch_size"],
+                )
+            if self.config["streaming_vad"] and self.config["capture"] == "pipe":
+                from faster_whisper.vad import get_vad_model
+
+                # Create the ONNX session now rather than on the first key press
+                get_vad_model()
+            if isinstance(self.model, ModelScheduler) and self.config["warmup"]:
+                self._warm_up()
+            self.model_loaded.set()
+            if isinstance(self.model, ModelScheduler):
+                self._start_servers()
+            hotkey_name = str(self.config["key"]).upper()
+            print("Model loaded. Ready for dictation!")
+            print(f"Hold [{hotkey_name}] to record, release to transcribe.")
+            print("Press Ctrl+C to quit.")
+        except Exception as e:
+            self.model_error = str(e)
+            self.model_loaded.set()
+            print(f"Failed to load model: {e}")
+            if "cudnn" in str(e).lower() or "cuda" in str(e).lower():
+                print(
+                    "Hint: Try setting device = cpu in your config, or install cuDNN."
+                )
+
+    def _start_servers(self):
+        """Share the model over the socket API and HTTP, as configured."""
+        # Dictation keeps working when a server can't start, e.g. because
+        # another instance already serves on the same socket or port
+        if self.config["daemon_serve"]:
+            try:
+                start_daemon_server(self.model, self.config, __version__)
+            except Exception as e:
+                print(f"Warning: could not start the daemon socket: {e}")
+        if self.config["http"]:
+            try:
+                start_http_server(self.model, self.config)
+            except Exception as e:
+                print(f"Warning: could not start the HTTP endpoint: {e}")
+
+    def _connect_daemon(self):
+        """Return a RemoteModel for a running daemon, or None if there is none."""
+        try:
+            model = RemoteModel(self.config["daemon_socket"])
+        except Exception as e:
+            print(f"Daemon not available ({e}), loading the model locally")
+            return None
+        print(f"Using the daemon's model ({model.status['model']})")
+        return model
+
+    def _warm_up(self):
+        """
+        Run a short synthetic dictation so the first real one is not slower.
+
+        This pays the CTranslate2 allocator warm-up, the Silero ONNX session
+        start and (for file capture) PyAV initialization before announcing
+        readiness.
+        """
+        print("Warming up model...")
+        start = time.monotonic()
+        try:
+            audio = warm_up_model(self.model, self.config["live_typing"])
+
+            if self.config["streaming_vad"] and self.config["capture"] == "pipe":
+                StreamingVad().feed((audio * 32767).astype(np.int16))
+
+            if self.config["capture"] == "file":
+                wav = io.BytesIO()
+                with wave.open(wav, "wb") as writer:
+                    writer.setnchannels(1)
+                    writer.setsampwidth(2)
+                    writer.setframerate(SAMPLE_RATE)
+                    writer.writeframes((audio * 32767).astype(np.int16).tobytes())
+                wav.seek(0)
+                from faster_whisper import decode_audio
+
+                decode_audio(wav)
+
+            print(f"Warm-up done in {time.monotonic() - start:.2f}s")
+        except Exception as e:
+            # A failed warm-up only costs first-dictation latency
+            print(f"Warm-up failed: {e}")
+
+    def notify(self, title, message, icon="dialog-information", timeout=2000):
+        """Send a desktop notification without waiting for it to be shown."""
+        if not self.config["notifications"]:
+            return
+        if self.notifier is None:
+            self.notifier = Notifier()
+        self.notifier.notify(title, message, icon, timeout)
+
+    def key_pressed(self, event_time):
+        """
+        Handle a hotkey press; event_time is its evdev timestamp.
+
+        With min_hold_ms set, the dictation is only committed once the key has
+        been held that long. Warm capture needs nothing before then, since the
+        pre-roll reaches back to the press. Otherwise the recorder starts right
+        away so no audio is lost, and only the notification waits.
+        """
+        with self.key_lock:
+            if self.recording or self.pending_press:
+                return
+            if self.config["min_hold_ms"] <= 0:
+                self.start_recording(event_time)
+                return
+            if not self.warm_capture:
+                self.start_recording(event_time, announce=False)
+            self.pending_press = threading.Timer(
+                self.config["min_hold_ms"] / 1000,
+                self._commit_press,
+                args=(event_time,),
+            )
+            self.pending_press.daemon = True
+            self.pending_press.start()
+
+    def _commit_press(self, event_time):
+        with self.key_lock:
+            if self.pending_press is None:
+                return
+            self.pending_press = None
+            if self.warm_capture:
+                self.start_recording(event_time)
+            elif self.recording:
+                self._announce_recording()
+
+    def key_released(self, event_time):
+        """Handle a hotkey release; event_time is its evdev timestamp."""
+        with self.key_lock:
+            if self.pending_press:
+                # Released before min_hold_ms: a tap, not a dictation
+                self.pending_press.cancel()
+                self.pending_press = None
+                self.cancel_recording()
+                print("Ignored short tap")
+                return
+        if self.recording:
+            self.stop_recording(event_time)
+
+    def start_recording(self, event_time=None, announce=True):
+        """Start a dictation; event_time is the evdev timestamp of the key press."""
+        if self.recording or self.model_error:
+            return
+
+        if not self.audio_command_builder:
+            print("ERROR: Audio command builder not found!")
+            return
+
+        self.recording = True
+
+        if self.warm_capture:
+            # The recorder is already running; seed the buffer from the pre-roll
+            self.audio = PcmBuffer(vad=self._new_vad())
+            self.warm_capture.begin(self.audio, event_time)
+        elif self.config["capture"] == "pipe":
+            # Stream raw samples from the recorder straight into memory
+            self.audio = PcmBuffer(vad=self._new_vad())
+            self.recorder = PipeRecorder(
+                self.audio_command_builder(), self.audio.append
+            )
+        else:
+            self.temp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+            self.temp_file.close()
+            command = self.audio_command_builder(self.temp_file.name)
+            self.record_process = subprocess.Popen(
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        if self.config["incremental"] and self.audio is not None:
+            self.incremental = IncrementalTranscriber(
+                self.audio, self._transcribe_chunk
+            )
+        elif self.config["live_typing"] and self.audio is not None:
+            self.live = LocalAgreementStreamer(
+                self.audio,
+                self._transcribe_words,
+                self._type_live,
+                self.config["live_interval_ms"],
+            )
+
+        if not self.warm_capture:
+            # Small delay to ensure audio buffer is ready and first words aren't lost
+            time.sleep(0.05)
+        if announce:
+            self._announce_recording()
+
+    def _announce_recording(self):
+        print(f"Recording with {self.audio_backend}...")
+        hotkey_name = str(self.config["key"]).upper()
+        self.notify(
+            "Recording...",
+            f"Release {hotkey_name} when done",
+            "audio-input-microphone",
+            30000,
+        )
+
+    def cancel_recording(self):
+        """Discard the current recording without transcribing it."""
+        if not self.recording:
+            return
+
+        self.recording = False
+
+        if self.warm_capture:
+            self.warm_capture.end()
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+        if self.record_process:
+            stop_recorder_process(self.record_process)
+            self.record_process = None
+        for background in (self.incremental, self.live):
+            if background:
+                background.finish()
+        if self.temp_file and os.path.exists(self.temp_file.name):
+            os.unlink(self.temp_file.name)
+        self.audio = None
+        self.temp_file = None
+        self.incremental = None
+        self.live = None
+
+    def stop_recording(self, event_time=None):
+        """
+        Finish a dictation; event_time is the evdev timestamp of the key release.
+
+        The recorder is only told to stop here. Waiting for it to exit is left
+        to the transcription worker, so key handling returns immediately.
+        """
+        if not self.recording:
+            return
+
+        self.recording = False
+
+        if self.warm_capture:
+            self.warm_capture.end(event_time)
+
+        if self.recorder:
+            self.recorder.interrupt()
+        if self.record_process:
+            interrupt_recorder_process(self.record_process)
+
+        if self.audio is not None:
+            job = TranscriptionJob(
+                incremental=self.incremental,
+                live=self.live,
+                buffer=self.audio,
+                recorder=self.recorder,
+            )
+            self.audio = None
+            self.incremental = None
+            self.live = None
+        elif self.temp_file:
+            job = TranscriptionJob(
+                path=self.temp_file.name, record_process=self.record_process
+            )
+            self.temp_file = None
+        else:
+            return
+        self.recorder = None
+        self.record_process = None
+
+        if self.jobs.qsize():
+            print(f"Queued recording ({self.jobs.qsize()} ahead)")
+        self.jobs.put(job)
+
+    def _transcription_worker(self):
+        """Transcribe queued recordings one at a time, in press order."""
+        while self.running:
+            job = self.jobs.get()
+            try:
+                job.finish_recording()
+                self._process_job(job)
+            finally:
+                self.jobs.task_done()
+
+    def _process_job(self, job):
+        if job.audio is not None and not has_audible_signal(
+            job.audio, self.config["gate_rms"], self.config["gate_min_ms"]
+        ):
+            # Accidental tap or silent hold: skip the model entirely
+            job.cleanup()
+            print("No speech detected (silent or too short)")
+            self.notify("No speech detected", "", "dialog-warning", 1000)
+            return
+
+        print("Transcribing...")
+        self.notify(
+            "Transcribing...", "Processing your speech", "emblem-synchronizing", 30000
+        )
+
+        # Wait for model if not loaded yet
+        self.model_loaded.wait()
+
+        if self.model_error:
+            print(f"Cannot transcribe: model failed to load")
+            self.notify("Error", "Model failed to load", "dialog-error", 3000)
+            job.cleanup()
+            return
+
+        # Transcribe
+        try:
+            if not self.model:
+                print("Error: Model not initialized")
+                return
+
+            speech = None
+            if job.audio is not None:
+                if len(job.audio) == 0:
+                    print("Error: No audio was captured")
+                    self.notify("Error", "Recording is empty", "dialog-error", 3000)
+                    return
+                source = job.audio
+                texts = []
+                committed = 0
+                if job.incremental:
+                    # Only the tail recorded after the last finished region is left
+                    texts, committed = job.incremental.finish()
+                    source = job.audio[committed:]
+                elif job.live:
+                    # Only the tail after the last typed word is left
+                    texts, committed = job.live.finish()
+                    source = job.audio[committed:]
+                if job.vad is not None:
+                    # Speech was detected while recording; no VAD pass needed now
+                    job.vad.flush()
+                    speech = clip_spans(
+                        job.vad.speech_spans(), committed, len(job.audio)
+                    )
+                print(f"Transcribing {len(source) / SAMPLE_RATE:.1f}s of audio...")
+            else:
+                # Small delay to ensure file is flushed to disk
+                time.sleep(0.1)
+
+                # Verify temp file exists and has content
+                if not job.path or not os.path.exists(job.path):
+                    print(f"Error: Temp file does not exist: {job.path}")
+                    self.notify(
+                        "Error", "Recording file not found", "dialog-error", 3000
+                    )
+                    return
+
+                file_size = os.path.getsize(job.path)
+                if file_size == 0:
+                    print(f"Error: Temp file is empty: {job.path}")
+                    self.notify(
+                        "Error", "Recording file is empty", "dialog-error", 3000
+                    )
+                    return
+
+                print(f"Transcribing {file_size} bytes from {job.path}...")
+                source = job.path
+                texts = []
+
+            segments: Iterable[str] = ()
+            if isinstance(source, str) or len(source):
+                segments = self._transcribe_segments(source, speech)
+            # The live prefix is already in the focused window
+            typed = job.live.typed if job.live else ""
+
+            if self.config["stream_output"] and self.config["auto_type"]:
+                text = self._stream_text(itertools.chain(texts, segments), typed)
+                type_text = ""
+            else:
+                text = " ".join(t for t in itertools.chain(texts, segments) if t)
+                type_text = text[len(typed) :]
+
+            if text:
+                self._output_text(text, type_text)
+            else:
+                print("No speech detected")
+                self.notify(
                     "No speech detected", "Try speaking louder", "dialog-warning", 2000
                 )
 
@@ -626,13 +2541,144 @@ class Dictation:
             print(f"Error: {e}")
             self.notify("Error", str(e)[:50], "dialog-error", 3000)
         finally:
-            # Cleanup temp file
-            if self.temp_file and os.path.exists(self.temp_file.name):
-                os.unlink(self.temp_file.name)
+            job.cleanup()
+
+    def _transcribe(self, source, speech=None):
+        """
+        Transcribe a float32 array or audio file path and return the text.
+
+        speech holds precomputed speech spans of the array; when given, the
+        array is cut to them directly instead of running VAD again.
+        """
+        return " ".join(t for t in self._transcribe_segments(source, speech) if t)
+
+    def _transcribe_segments(self, source, speech=None):
+        """Like _transcribe, but yield each segment's text as it is decoded."""
+        if speech is not None:
+            source = collect_speech(source, speech)
+            if len(source) == 0:
+                return
+        segments, info = self.model.transcribe(  # type: ignore[union-attr]
+            source,
+            beam_size=5,
+            vad_filter=speech is None,
+            vad_parameters=get_vad_options(),
+        )
+        for segment in segments:
+            yield segment.text.strip()
+
+    def _stream_text(self, pieces, typed=""):
+        """
+        Type pieces of text as they arrive and return them joined.
+
+        typed is a prefix of the text that is already in the focused window.
+        """
+        text = ""
+        for piece in pieces:
+            if not piece:
+                continue
+            text = f"{text} {piece}" if text else piece
+            if len(text) > len(typed):
+                self.output.type_text(text[len(typed) :])
+                typed = text
+        return text
+
+    def _transcribe_chunk(self, audio, speech=None):
+        """Transcribe a region for incremental mode, or None if the model isn't ready."""
+        if not self.model_loaded.is_set() or not self.model:
+            return None
+        return self._transcribe(audio, speech)
+
+    def _new_vad(self):
+        """Return a StreamingVad for a new recording, if enabled."""
+        if not self.config["streaming_vad"] or self.model_error:
+            return None
+        try:
+            return StreamingVad()
+        except Exception as e:
+            print(f"Streaming VAD unavailable, falling back to VAD after release: {e}")
+            return None
+
+    def _transcribe_words(self, audio, prompt):
+        """Decode audio into (word, end time) pairs for live typing."""
+        if not self.model_loaded.is_set() or not self.model:
+            return None
+        segments, info = self.model.transcribe(
+            audio,
+            beam_size=5,
+            vad_filter=True,
+            vad_parameters=get_vad_options(),
+            word_timestamps=True,
+            initial_prompt=prompt or None,
+        )
+        return [
+            (word.word, word.end)
+            for segment in segments
+            for word in segment.words or []
+        ]
+
+    def _type_live(self, text):
+        """Type live text unless earlier recordings are still being output."""
+        if self.jobs.unfinished_tasks:
+            return False
+        self.output.type_text(text)
+        return True
+
+    def _output_text(self, text, type_text=None):
+        """
+        Copy text to the clipboard, type it and announce it, concurrently.
+
+        type_text is what still needs typing when part of text is already typed.
+        """
+        partly_typed = type_text is not None and type_text != text
+        if type_text is None:
+            type_text = text
+
+        # Type it into the active input field. Long text, or text the typing
+        # tool can't type, that hasn't been partly typed already is pasted
+        # from the clipboard in one chord.
+        method = None
+        if self.config["auto_type"] and type_text:
+            threshold = self.config["paste_threshold"]
+            long_text = bool(threshold) and len(text) > threshold
+            if not partly_typed and (long_text or not self.output.can_type(text)):
+                method = "paste"
+            else:
+                method = "typing"
+
+        stage = OutputStage()
+        # When typing has to paste the rest, it uses the clipboard first
+        typing_pastes = method == "typing" and not self.output.can_type(type_text)
+        stage.add(
+            "clipboard",
+            lambda: self.output.copy(text),
+            after=["typing"] if typing_pastes else [],
+        )
+        if method == "paste":
+            stage.add("paste", self.output.paste, after=["clipboard"])
+        elif method == "typing":
+            stage.add("typing", lambda: self.output.type_text(type_text))
+        stage.add(
+            "notification",
+            lambda: self.notify(
+                "Copied!",
+                text[:100] + ("..." if len(text) > 100 else ""),
+                "emblem-ok-symbolic",
+                3000,
+            ),
+        )
+        timings = stage.run()
+
+        print(f"Copied: {text}")
+        print(
+            "Output done in "
+            + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items())
+        )
 
     def stop(self):
         print("\nExiting...")
         self.running = False
+        self.output.close()
         os._exit(0)
 
     def run_evdev_hotkey(self, keyboard_devices, target_key_code):
@@ -640,73 +2686,37 @@ class Dictation:
         Run with evdev for direct keyboard monitoring on Wayland.
 
         Reads keyboard events directly from /dev/input/event* devices.
-        Monitors ALL keyboard devices simultaneously so F9 works on any keyboard.
+        Monitors ALL keyboard devices simultaneously so F9 works on any keyboard,
+        including ones plugged in after startup.
         """
-        from evdev import ecodes, categorize
-
-        key_name = str(CONFIG["key"]).upper()
+        key_name = str(self.config["key"]).upper()
         print(
             f"Monitoring {len(keyboard_devices)} keyboard(s) for {key_name} key (code: {target_key_code})..."
         )
         print("Press Ctrl+C to quit.")
         print("(Debug: Key events will be logged)")
 
-        def monitor_device(device):
-            """Monitor a single keyboard device in a separate thread."""
-            try:
-                for event in device.read_loop():
-                    # Only process key events
-                    if event.type == ecodes.EV_KEY:
-                        # Check if this is our target key
-                        if event.code == target_key_code:
-                            # event.value: 0 = release, 1 = press, 2 = hold
-                            if event.value == 1:  # Key pressed
-                                print(
-                                    f"DEBUG: {key_name} key PRESSED on {device.name} (code: {event.code})"
-                                )
-                                if not self.recording:
-                                    self.start_recording()
-                            elif event.value == 0:  # Key released
-                                print(
-                                    f"DEBUG: {key_name} key RELEASED on {device.name} (code: {event.code})"
-                                )
-                                if self.recording:
-                                    self.stop_recording()
-                            # Ignore repeat events (value == 2)
-            except PermissionError:
+        def on_key(device, event):
+            # event.value: 0 = release, 1 = press, 2 = hold
+            if event.value == 1:  # Key pressed
                 print(
-                    f"ERROR: Permission denied accessing keyboard device: {device.name}"
+                    f"DEBUG: {key_name} key PRESSED on {device.name} (code: {event.code})"
                 )
-            except OSError as e:
-                print(f"ERROR: Keyboard device error on {device.name}: {e}")
-            except Exception as e:
-                print(f"ERROR: Unexpected error monitoring {device.name}: {e}")
-
-        # Start a monitoring thread for each keyboard device
-        monitor_threads = []
-        for device in keyboard_devices:
-            thread = threading.Thread(
-                target=monitor_device,
-                args=(device,),
-                daemon=True,
-                name=f"KeyboardMonitor-{device.name}",
-            )
-            thread.start()
-            monitor_threads.append((thread, device))
+                self.key_pressed(event.timestamp())
+            elif event.value == 0:  # Key released
+                print(
+                    f"DEBUG: {key_name} key RELEASED on {device.name} (code: {event.code})"
+                )
+                self.key_released(event.timestamp())
+            # Ignore repeat events (value == 2)
 
+        manager = KeyboardManager(keyboard_devices, target_key_code, on_key)
         try:
-            # Wait for all threads (they run until interrupted)
-            for thread, device in monitor_threads:
-                thread.join()
+            manager.run()
         except KeyboardInterrupt:
             print("\nStopping keyboard monitors...")
         finally:
-            # Close all devices
-            for thread, device in monitor_threads:
-                try:
-                    device.close()
-                except Exception:
-                    pass  # Device may already be closed
+            manager.close()
 
 
 def check_dependencies():
@@ -714,26 +2724,19 @@ def check_dependencies():
     missing = []
 
     # Check for any audio backend
-    has_audio = any(
-        subprocess.run(["which", cmd], capture_output=True).returncode == 0
-        for cmd in ["parecord", "pw-record", "arecord"]
-    )
+    has_audio = any(has_tool(cmd) for cmd in ["parecord", "pw-record", "arecord"])
     if not has_audio:
         missing.append(("audio backend", "none"))
 
     # Check for clipboard tool (Wayland only)
-    has_clipboard = (
-        subprocess.run(["which", "wl-copy"], capture_output=True).returncode == 0
-    )
+    has_clipboard = has_tool("wl-copy")
     if not has_clipboard:
         missing.append(("clipboard tool", "none"))
 
     # Check for typing tool if auto-typing is enabled (Wayland only)
-    if AUTO_TYPE:
-        has_typing = any(
-            subprocess.run(["which", cmd], capture_output=True).returncode == 0
-            for cmd in ["wtype", "dotool"]
-        )
+    # (uinput is built in and checked when the typing tool is chosen)
+    if get_config()["auto_type"] and get_config()["typing_tool"] != "uinput":
+        has_typing = any(has_tool(cmd) for cmd in ["wtype", "dotool"])
         if not has_typing:
             missing.append(("typing tool", "none"))
 
@@ -757,6 +2760,44 @@ def check_dependencies():
         sys.exit(1)
 
 
+def run_daemon():
+    """Load the model and serve the socket API until interrupted."""
+    config = get_config()
+    print(f"Loading Whisper model ({config['model']})...")
+    try:
+        scheduler = ModelScheduler(
+            load_whisper_model(config),
+            config["batch_window_ms"],
+            config["max_batch_size"],
+        )
+        if config["warmup"]:
+            print("Warming up model...")
+            start = time.monotonic()
+            try:
+                warm_up_model(scheduler)
+                print(f"Warm-up done in {time.monotonic() - start:.2f}s")
+            except Exception as e:
+                # A failed warm-up only costs first-request latency
+                print(f"Warm-up failed: {e}")
+        server = DaemonServer(config["daemon_socket"], scheduler, config, __version__)
+        if config["http"]:
+            start_http_server(scheduler, config)
+    except Exception as e:
+        print(f"ERROR: Could not start the daemon: {e}")
+        sys.exit(1)
+
+    print(f"Daemon listening on {server.path}")
+    print("Press Ctrl+C to quit.")
+    # Exit through KeyboardInterrupt on SIGTERM too, so the socket is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExiting...")
+    finally:
+        server.server_close()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="SoupaWhisper - Push-to-talk voice dictation for KDE Wayland"
@@ -764,11 +2805,21 @@ def main():
     parser.add_argument(
         "-v", "--version", action="version", version=f"SoupaWhisper {__version__}"
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep the model loaded and serve transcriptions on a Unix socket, "
+        "without the hotkey",
+    )
     args = parser.parse_args()
 
     print(f"SoupaWhisper v{__version__}")
     print(f"Config: {CONFIG_PATH}")
 
+    if args.daemon:
+        run_daemon()
+        return
+
     # Check if running on KDE Wayland
     if not is_kwin_wayland():
         print("ERROR: SoupaWhisper only supports KDE Plasma Wayland.")
@@ -779,7 +2830,7 @@ def main():
 
     # Initialize evdev keyboard monitoring
     try:
-        evdev_devices, evdev_key_code = _load_evdev_keyboard(CONFIG["key"])
+        evdev_devices, evdev_key_code = _load_evdev_keyboard(get_config()["key"])
         print("Using evdev for KDE Wayland keyboard monitoring")
     except Exception as e:
         print("ERROR: Failed to initialize evdev keyboard monitor.")
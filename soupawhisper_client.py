@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Client for the SoupaWhisper daemon
+Transcribes audio with the model kept loaded by `dictate.py --daemon`.
+
+Only the standard library is used, so scripts and editor plugins can copy
+this file or import DaemonClient without installing SoupaWhisper's
+dependencies.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import socket
+import stat
+import sys
+
+
+class DaemonError(Exception):
+    """The daemon reported an error or closed the connection early."""
+
+
+def default_socket_path():
+    """Return the daemon's socket path: $SOUPAWHISPER_SOCKET or the runtime dir."""
+    if os.environ.get("SOUPAWHISPER_SOCKET"):
+        return os.environ["SOUPAWHISPER_SOCKET"]
+    runtime_dir = (
+        os.environ.get("XDG_RUNTIME_DIR") or f"/tmp/soupawhisper-{os.getuid()}"
+    )
+    return os.path.join(runtime_dir, "soupawhisper.sock")
+
+
+def check_socket_dir(path):
+    """
+    Refuse a socket directory another user could control.
+
+    Without XDG_RUNTIME_DIR the socket lives under /tmp, where another user
+    could create the directory first and receive the audio. The directory
+    must be a real directory (not a symlink), owned by this user, mode 0700.
+    """
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"Socket directory {path} is not a directory")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"Socket directory {path} is owned by another user")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        raise PermissionError(
+            f"Socket directory {path} must have mode 0700, "
+            f"not {stat.S_IMODE(info.st_mode):04o}"
+        )
+
+
+# Seals that make a memfd immutable, as the daemon requires before mapping it
+MEMFD_SEALS = (
+    fcntl.F_SEAL_SHRINK | fcntl.F_SEAL_GROW | fcntl.F_SEAL_WRITE | fcntl.F_SEAL_SEAL
+)
+
+
+def seal_memfd(fd):
+    """
+    Seal a memfd so the daemon can map it.
+
+    Any writable mmap of it must be closed first, or F_SEAL_WRITE fails.
+    """
+    fcntl.fcntl(fd, fcntl.F_ADD_SEALS, MEMFD_SEALS)
+
+
+def sealed_memfd(data):
+    """
+    Copy audio (any bytes-like object, e.g. a float32 NumPy array) into a
+    new sealed memfd and return its descriptor; the caller closes it.
+
+    To avoid even this copy, create a memfd with os.memfd_create(...,
+    os.MFD_ALLOW_SEALING), size it with os.ftruncate, record into an mmap
+    of it, close the mmap and call seal_memfd.
+    """
+    fd = os.memfd_create("soupawhisper-audio", os.MFD_CLOEXEC | os.MFD_ALLOW_SEALING)
+    try:
+        view = memoryview(data).cast("B")
+        while view:
+            view = view[os.write(fd, view) :]
+        seal_memfd(fd)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+class DaemonClient:
+    """
+    Talk to the daemon over its Unix socket.
+
+    Every request opens its own connection and sends one JSON line, followed
+    by the audio for PCM submissions. The daemon answers with JSON lines:
+    a status object, or one {"segment": ...} per decoded segment followed by
+    {"done": true, "text": ...}.
+    """
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def _send(self, header, payload=b"", fds=()):
+        check_socket_dir(os.path.dirname(os.path.abspath(self.socket_path)))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            line = json.dumps(header).encode() + b"\n"
+            if fds:
+                # The descriptors travel with the request line (SCM_RIGHTS)
+                sent = socket.send_fds(sock, [line], list(fds))
+                sock.sendall(line[sent:])
+            else:
+                sock.sendall(line + payload)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _replies(sock):
+        """Yield the JSON replies from a connection until it is closed."""
+        with sock, sock.makefile("rb") as replies:
+            for line in replies:
+                reply = json.loads(line)
+                if "error" in reply:
+                    raise DaemonError(reply["error"])
+                yield reply
+
+    def status(self):
+        """Return the daemon's status (model, device, queued requests, ...)."""
+        for reply in self._replies(self._send({"op": "status"})):
+            return reply
+        raise DaemonError("Daemon closed the connection without replying")
+
+    def _segments(self, sock):
+        for reply in self._replies(sock):
+            if reply.get("done"):
+                return
+            yield reply["segment"]
+        raise DaemonError("Daemon closed the connection before finishing")
+
+    def transcribe_file(self, path, priority=None, **options):
+        """
+        Transcribe an audio file the daemon can read; yield segment dicts.
+
+        options are passed to WhisperModel.transcribe (language, beam_size,
+        initial_prompt, word_timestamps, vad_filter, vad_parameters, ...).
+        priority is "batch" (the default) or "interactive"; the daemon decodes
+        interactive requests first and splits long batch ones so they wait
+        at most one piece.
+        """
+        header = {"op": "transcribe", "path": os.path.abspath(path)}
+        if priority:
+            header["priority"] = priority
+        if options:
+            header["options"] = options
+        return self._segments(self._send(header))
+
+    def transcribe_pcm(self, data, pcm_format="s16le", priority=None, **options):
+        """
+        Transcribe raw 16 kHz mono samples (s16le or f32le); yield segment dicts.
+
+        The request is sent before this returns, so it is queued right away.
+        """
+        header = {
+            "op": "transcribe",
+            "pcm": {"format": pcm_format, "bytes": len(data)},
+        }
+        if priority:
+            header["priority"] = priority
+        if options:
+            header["options"] = options
+        return self._segments(self._send(header, data))
+
+    def transcribe_fd(
+        self, fd, pcm_format="f32le", size=None, priority=None, **options
+    ):
+        """
+        Transcribe 16 kHz mono audio held in a sealed memfd; yield segment dicts.
+
+        The daemon maps the memfd instead of receiving the audio over the
+        socket, so submitting f32le audio copies nothing. size defaults to
+        the whole memfd. The descriptor may be closed once this returns.
+        """
+        pcm = {"format": pcm_format, "fd": True}
+        if size is not None:
+            pcm["bytes"] = size
+        header = {"op": "transcribe", "pcm": pcm}
+        if priority:
+            header["priority"] = priority
+        if options:
+            header["options"] = options
+        return self._segments(self._send(header, fds=[fd]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Transcribe audio with a running SoupaWhisper daemon"
+    )
+    parser.add_argument(
+        "audio",
+        nargs="?",
+        help="Audio file, or - for raw 16 kHz mono s16le on stdin. "
+        "Without it, the daemon's status is shown.",
+    )
+    parser.add_argument("--socket", help="Daemon socket path")
+    parser.add_argument(
+        "--memfd",
+        action="store_true",
+        help="Pass stdin audio to the daemon in a sealed memfd instead of the socket",
+    )
+    parser.add_argument("--language", help="Language code, e.g. en")
+    parser.add_argument(
+        "--priority",
+        choices=["batch", "interactive"],
+        help="Queue ahead of batch work (interactive) or behind it (batch, default)",
+    )
+    parser.add_argument(
+        "--segments",
+        action="store_true",
+        help="Print each segment with its timestamps as it is decoded",
+    )
+    args = parser.parse_args()
+
+    client = DaemonClient(args.socket)
+    options = {"language": args.language} if args.language else {}
+    if args.priority:
+        options["priority"] = args.priority
+    try:
+        if args.audio is None:
+            print(json.dumps(client.status(), indent=2))
+            return
+        if args.audio == "-" and args.memfd:
+            fd = sealed_memfd(sys.stdin.buffer.read())
+            try:
+                segments = client.transcribe_fd(fd, "s16le", **options)
+            finally:
+                os.close(fd)
+        elif args.audio == "-":
+            segments = client.transcribe_pcm(sys.stdin.buffer.read(), **options)
+        else:
+            segments = client.transcribe_file(args.audio, **options)
+
+        texts = []
+        for segment in segments:
+            if args.segments:
+                print(
+                    f"[{segment['start']:.2f} -> {segment['end']:.2f}] {segment['text']}",
+                    flush=True,
+                )
+            texts.append(segment["text"])
+        if not args.segments:
+            print(" ".join(t for t in texts if t))
+    except (OSError, DaemonError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        print(
+            "Is the daemon running? Start it with: python dictate.py --daemon",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1245 @@
+"""
+Model server for SoupaWhisper
+Loads the Whisper model and shares it: every transcription (the hotkey,
+socket clients, HTTP requests) is queued on one ModelScheduler, which
+`dictate.py --daemon` serves on a Unix socket and over HTTP.
+
+faster_whisper (ctranslate2, av, onnxruntime, tokenizers) is imported where
+it is used, so importing this module stays fast.
+"""
+
+from __future__ import annotations
+
+import collections
+import email.parser
+import email.policy
+import fcntl
+import functools
+import http.server
+import io
+import json
+import mmap
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+import types
+from dataclasses import asdict, replace
+from typing import Any, Optional
+
+import numpy as np
+
+from soupawhisper_client import DaemonClient, check_socket_dir, sealed_memfd
+
+# Whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+
+@functools.lru_cache(maxsize=None)
+def get_vad_options():
+    """Return the VAD options used for dictation."""
+    from faster_whisper.vad import VadOptions
+
+    # Configure VAD to be less aggressive and preserve first words
+    return VadOptions(
+        threshold=0.3,  # Lower = less aggressive (default 0.5)
+        min_silence_duration_ms=100,  # Reduced from default 2000ms to catch speech sooner
+        speech_pad_ms=500,  # Increased padding around speech (default 400ms)
+    )
+
+
+def load_whisper_model(config):
+    """Load the configured WhisperModel."""
+    # Deferred: pulls in ctranslate2, av, onnxruntime and tokenizers
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(
+        str(config["model"]),
+        device=str(config["device"]),
+        compute_type=str(config["compute_type"]),
+    )
+
+
+def warm_up_model(model, word_timestamps=False):
+    """Decode a short tone, with and without VAD, to warm up the model."""
+    t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+    audio = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    # With VAD, as a real dictation runs it
+    segments, info = model.transcribe(
+        audio, beam_size=5, vad_filter=True, vad_parameters=get_vad_options()
+    )
+    list(segments)
+    # VAD may drop the tone, so also decode it without VAD
+    segments, info = model.transcribe(
+        audio, beam_size=5, word_timestamps=word_timestamps
+    )
+    list(segments)
+    return audio
+
+
+# Scheduling classes, most urgent first. Interactive work (the hotkey) is
+# always picked before batch work (files, other clients).
+PRIORITIES = ("interactive", "batch")
+
+# Long batch jobs are decoded in pieces of about this much audio, cut in
+# pauses between speech, so waiting interactive jobs can run in between
+BATCH_PIECE_SECONDS = 30
+
+# Text carried over as the prompt of a batch job's next piece
+PIECE_PROMPT_CHARS = 200
+
+
+def split_at_pauses(audio, vad_parameters, vad_filter):
+    """
+    Split audio into pieces of about BATCH_PIECE_SECONDS, cut between speech.
+
+    Returns (start, end, clips) per piece: the piece is audio[start:end] and
+    clips its clip_timestamps in seconds from start. With vad_filter the
+    clips are the speech spans; otherwise clips is None and the pieces
+    cover the audio end to end.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    if isinstance(vad_parameters, dict):
+        vad_parameters = VadOptions(**vad_parameters)
+    spans = get_speech_timestamps(audio, vad_parameters or get_vad_options())
+    pieces: list[list[dict]] = []
+    for span in spans:
+        if pieces and span["end"] - pieces[-1][0]["start"] <= (
+            BATCH_PIECE_SECONDS * SAMPLE_RATE
+        ):
+            pieces[-1].append(span)
+        else:
+            pieces.append([span])
+    if vad_filter:
+        return [
+            (
+                piece[0]["start"],
+                piece[-1]["end"],
+                [
+                    (t - piece[0]["start"]) / SAMPLE_RATE
+                    for span in piece
+                    for t in (span["start"], span["end"])
+                ],
+            )
+            for piece in pieces
+        ]
+    bounds = [0] + [piece[0]["start"] for piece in pieces[1:]] + [len(audio)]
+    return [(start, end, None) for start, end in zip(bounds, bounds[1:])]
+
+
+def shift_segment(segment, segment_id, offset):
+    """Renumber a piece's segment and move its times by offset seconds."""
+    words = segment.words and [
+        replace(
+            word, start=round(word.start + offset, 3), end=round(word.end + offset, 3)
+        )
+        for word in segment.words
+    ]
+    return replace(
+        segment,
+        id=segment_id,
+        start=round(segment.start + offset, 3),
+        end=round(segment.end + offset, 3),
+        words=words,
+    )
+
+
+class ModelRequest:
+    """A transcription queued on a ModelScheduler."""
+
+    _DONE = object()
+
+    def __init__(self, audio, options, priority="interactive"):
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        self.audio = audio
+        self.options = options
+        self.priority = priority
+        self.submitted = time.monotonic()
+        self.results: "queue.Queue[Any]" = queue.Queue()
+        self.cancelled = False
+        # TranscriptionInfo (language, duration), set once decoding starts
+        self.info: Any = None
+        # Seconds between submission and the first decode, once known
+        self.waited: Optional[float] = None
+        # Pieces from split_at_pauses to decode one after another, set by
+        # prepare(); None decodes the audio in one go
+        self.pieces: Optional[list[tuple[int, int, Optional[list[float]]]]] = None
+
+    def prepare(self):
+        """Decode the audio and, if it is long, split it into pieces."""
+        if not isinstance(self.audio, np.ndarray):
+            from faster_whisper import decode_audio
+
+            self.audio = decode_audio(self.audio, sampling_rate=SAMPLE_RATE)
+        if len(self.audio) > BATCH_PIECE_SECONDS * SAMPLE_RATE:
+            self.pieces = split_at_pauses(
+                self.audio,
+                self.options.get("vad_parameters"),
+                self.options.get("vad_filter", True),
+            )
+
+    def run(self, model, between=None):
+        """
+        Decode on a scheduler thread, passing segments to the reader.
+
+        With pieces, each piece's samples are decoded on their own, calling
+        between() before each but the first, and segment times are moved
+        back onto the whole audio's.
+        """
+        try:
+            options = dict(self.options)
+            count = 0
+            text = ""
+            for index, piece in enumerate(
+                [None] if self.pieces is None else self.pieces
+            ):
+                if index:
+                    if between:
+                        between()
+                    if options.get("condition_on_previous_text", True):
+                        options["initial_prompt"] = text[-PIECE_PROMPT_CHARS:] or None
+                if self.cancelled:
+                    break
+                if piece is None:
+                    segments, self.info = model.transcribe(self.audio, **options)
+                    for segment in segments:
+                        if self.cancelled:
+                            break
+                        self.results.put(segment)
+                    continue
+                start, end, clips = piece
+                if clips is not None:
+                    options["clip_timestamps"] = clips
+                # Only the piece's samples, so features are computed for it alone
+                segments, info = model.transcribe(self.audio[start:end], **options)
+                if self.info is None:
+                    self.info = replace(info, duration=len(self.audio) / SAMPLE_RATE)
+                for segment in segments:
+                    if self.cancelled:
+                        break
+                    # Number segments and time them across pieces
+                    count += 1
+                    segment = shift_segment(segment, count, start / SAMPLE_RATE)
+                    text += segment.text
+                    self.results.put(segment)
+            self.results.put(self._DONE)
+        except Exception as e:
+            self.results.put(e)
+
+    def segments(self):
+        """Yield segments as they are decoded; closing this cancels the rest."""
+        try:
+            while True:
+                item = self.results.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancelled = True
+
+
+class QueueWaitStats:
+    """
+    How long requests of one priority class waited before decoding.
+
+    The wait runs from submission until the request's first audio is
+    decoded: its first piece on the scheduler thread, or its first batch in
+    the MicroBatcher, so it includes preparation and batching windows.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.last = 0.0
+
+    def add(self, wait):
+        self.count += 1
+        self.total += wait
+        self.longest = max(self.longest, wait)
+        self.last = wait
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_wait_ms": (
+                round(1000 * self.total / self.count, 1) if self.count else 0
+            ),
+            "max_wait_ms": round(1000 * self.longest, 1),
+            "last_wait_ms": round(1000 * self.last, 1),
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def _batching_pipeline_class():
+    """Return a BatchedInferencePipeline subclass that decodes via a MicroBatcher."""
+    # Deferred like every faster_whisper import
+    from faster_whisper import BatchedInferencePipeline
+
+    class BatchingPipeline(BatchedInferencePipeline):
+        """Hands each decode step (forward) to a MicroBatcher."""
+
+        def __init__(self, model, batcher, request):
+            super().__init__(model)
+            self.batcher = batcher
+            self.request = request
+
+        def forward(self, features, tokenizer, chunks_metadata, options):
+            return self.batcher.forward(
+                self, features, tokenizer, chunks_metadata, options
+            )
+
+        def decode(self, features, tokenizer, chunks_metadata, options):
+            return super().forward(features, tokenizer, chunks_metadata, options)
+
+    return BatchingPipeline
+
+
+class BatchItem:
+    """Chunks from one request waiting in a MicroBatcher."""
+
+    def __init__(self, pipeline, features, tokenizer, chunks_metadata, options):
+        self.pipeline = pipeline
+        self.features = features
+        self.tokenizer = tokenizer
+        self.chunks_metadata = chunks_metadata
+        self.options = options
+        self.request = pipeline.request
+        self.priority = pipeline.request.priority
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+        if options.word_timestamps:
+            # Word alignment keeps per-request state in the pipeline
+            self.key: Any = object()
+        else:
+            # Chunks can share a decode if their prompt and settings match
+            self.key = (
+                tokenizer.task,
+                tokenizer.language,
+                repr(replace(options, clip_timestamps=None)),
+            )
+
+
+class MicroBatcher:
+    """
+    Decode chunks of concurrent requests together.
+
+    Each request runs faster-whisper's BatchedInferencePipeline on its own
+    thread, which does decoding, VAD, feature extraction and language
+    detection. Its decode step (forward) is handed here instead. The most
+    urgent waiting request (interactive before batch, then oldest) opens a
+    window of window_ms. Compatible chunks arriving
+    before it closes go into the same encoder/decoder call, up to
+    max_batch_size chunks; compatible means the same language, task and
+    decoding options. The window closes early once every request in
+    progress has queued its chunks, so a lone request doesn't wait.
+    on_decode is called with each request in a batch about to be decoded.
+    """
+
+    def __init__(self, model, window_ms, max_batch_size, on_decode=None):
+        self.model = model
+        self.on_decode = on_decode
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        # None wakes the batching thread when a request finishes
+        self.items: "queue.Queue[Optional[BatchItem]]" = queue.Queue()
+        self.held: list[BatchItem] = []
+        # Requests in progress, each of which may still queue chunks
+        self.active = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True, name="MicroBatcher").start()
+
+    def pipeline(self, request):
+        """Return a pipeline for one ModelRequest, decoding through this batcher."""
+        return _batching_pipeline_class()(self.model, self, request)
+
+    def run(self, request):
+        """Decode a ModelRequest through a pipeline of its own."""
+        options = dict(request.options, batch_size=self.max_batch_size)
+        vad_parameters = options.get("vad_parameters")
+        if vad_parameters is not None and not isinstance(vad_parameters, dict):
+            # As a dict, the pipeline caps speech chunks at 30 s
+            options["vad_parameters"] = asdict(vad_parameters)
+        request.options = options
+        with self.lock:
+            self.active += 1
+        try:
+            request.run(self.pipeline(request))
+        except Exception as e:
+            request.results.put(e)
+        finally:
+            with self.lock:
+                self.active -= 1
+            # An open window may have been waiting for this request
+            self.items.put(None)
+
+    def forward(self, pipeline, features, tokenizer, chunks_metadata, options):
+        """Queue chunks for the next batch and wait for their results."""
+        item = BatchItem(pipeline, features, tokenizer, chunks_metadata, options)
+        self.items.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _next_batch(self):
+        while not self.held:
+            item = self.items.get()
+            if item is not None:
+                self.held.append(item)
+        # Look at everything waiting, so interactive chunks go first
+        while True:
+            try:
+                item = self.items.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.held.append(item)
+        first = next(
+            (item for item in self.held if item.priority == "interactive"),
+            self.held[0],
+        )
+        self.held.remove(first)
+        batch = [first]
+        size = len(first.features)
+        deadline = time.monotonic() + self.window
+
+        def fits(item):
+            return (
+                item.key == first.key
+                and size + len(item.features) <= self.max_batch_size
+            )
+
+        for item in list(self.held):
+            if fits(item):
+                self.held.remove(item)
+                batch.append(item)
+                size += len(item.features)
+        # Each waiting item is one request blocked in forward(); once all
+        # requests in progress are waiting, no other chunks can arrive
+        while size < self.max_batch_size and len(batch) + len(self.held) < self.active:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.items.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                continue
+            if fits(item):
+                batch.append(item)
+                size += len(item.features)
+            else:
+                # Decoded in a later batch
+                self.held.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                if self.on_decode:
+                    for item in batch:
+                        self.on_decode(item.request)
+                features = np.concatenate([item.features for item in batch])
+                metadata = [m for item in batch for m in item.chunks_metadata]
+                first = batch[0]
+                outputs = first.pipeline.decode(
+                    features, first.tokenizer, metadata, first.options
+                )
+                offset = 0
+                for item in batch:
+                    count = len(item.chunks_metadata)
+                    item.result = outputs[offset : offset + count]
+                    offset += count
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            finally:
+                for item in batch:
+                    item.done.set()
+
+
+# Batch requests taken from the queue at once. Each holds its audio, VAD
+# and features while it is prepared and decoded, so a burst of uploads
+# waits in the queue instead of being prepared all together.
+MAX_ACTIVE_BATCH_REQUESTS = 4
+
+
+class ModelScheduler:
+    """
+    Share one loaded WhisperModel between everything that transcribes.
+
+    transcribe() takes WhisperModel.transcribe's arguments, but queues the
+    work and returns at once; the returned generator yields segments as they
+    are decoded. info is not known up front and is returned as None.
+
+    Requests are taken by priority: interactive ones (the default) before
+    batch ones. Batch requests are first prepared on a thread of their own:
+    their audio is decoded and, if long, split at pauses into pieces (see
+    split_at_pauses), so neither delays the scheduler thread. At most
+    MAX_ACTIVE_BATCH_REQUESTS are prepared or decoded at once; the rest
+    wait in the queue. Without batching, the scheduler thread decodes one
+    request at a time, running waiting interactive requests between the
+    pieces of a batch one, so they wait for one piece at most. With
+    batch_window_ms set, requests are decoded on their own threads in
+    micro-batches with concurrent requests (MicroBatcher), which decodes
+    interactive chunks first. Interactive requests never wait for a batch
+    slot.
+    """
+
+    def __init__(self, model, batch_window_ms=0, max_batch_size=8):
+        self.model = model
+        self.pending: dict[str, collections.deque[ModelRequest]] = {
+            priority: collections.deque() for priority in PRIORITIES
+        }
+        # Prepared batch requests waiting for the scheduler thread
+        self.ready: collections.deque[ModelRequest] = collections.deque()
+        self.waits = {priority: QueueWaitStats() for priority in PRIORITIES}
+        # Batch requests being prepared or decoded
+        self.active_batch = 0
+        self.condition = threading.Condition()
+        self.batcher: Optional[MicroBatcher] = None
+        if batch_window_ms > 0:
+            self.batcher = MicroBatcher(
+                model, batch_window_ms, max_batch_size, on_decode=self._record_wait
+            )
+        threading.Thread(target=self._run, daemon=True, name="ModelScheduler").start()
+
+    def submit(self, audio, priority="interactive", **options):
+        """Queue a transcription and return its ModelRequest."""
+        request = ModelRequest(audio, options, priority)
+        with self.condition:
+            self.pending[priority].append(request)
+            self._start_batch_requests()
+            self.condition.notify()
+        return request
+
+    def transcribe(self, audio, **options):
+        return self.submit(audio, **options).segments(), None
+
+    @property
+    def queued(self):
+        with self.condition:
+            return sum(len(requests) for requests in self.pending.values()) + len(
+                self.ready
+            )
+
+    def metrics(self):
+        """Return queued requests and queue-wait statistics per priority class."""
+        with self.condition:
+            queued = {priority: len(self.pending[priority]) for priority in PRIORITIES}
+            queued["batch"] += len(self.ready)
+            return {
+                priority: {"queued": queued[priority], **self.waits[priority].as_dict()}
+                for priority in PRIORITIES
+            }
+
+    def _start_batch_requests(self):
+        """Prepare queued batch requests while slots are free (lock held)."""
+        while self.pending["batch"] and self.active_batch < MAX_ACTIVE_BATCH_REQUESTS:
+            request = self.pending["batch"].popleft()
+            self.active_batch += 1
+            threading.Thread(
+                target=self._prepare, args=(request,), daemon=True, name="ModelRequest"
+            ).start()
+
+    def _prepare(self, request):
+        """Decode a batch request through the batcher, or prepare it for _run."""
+        if self.batcher is not None and self._batchable(request):
+            self.batcher.run(request)
+            self._finished(request)
+            return
+        try:
+            request.prepare()
+        except Exception as e:
+            request.results.put(e)
+            self._finished(request)
+            return
+        with self.condition:
+            self.ready.append(request)
+            self.condition.notify()
+
+    def _finished(self, request):
+        """Free a batch request's slot and start the next one."""
+        if request.priority == "batch":
+            with self.condition:
+                self.active_batch -= 1
+                self._start_batch_requests()
+
+    def _record_wait(self, request):
+        """Count a request's queue wait when its first audio is decoded."""
+        with self.condition:
+            if request.waited is None:
+                request.waited = time.monotonic() - request.submitted
+                self.waits[request.priority].add(request.waited)
+
+    def _take(self, interactive_only=False, block=True):
+        """
+        Pop the next request for the scheduler thread: an interactive one,
+        else a prepared batch one (None if there is none and not blocking).
+        """
+        with self.condition:
+            while True:
+                if self.pending["interactive"]:
+                    return self.pending["interactive"].popleft()
+                if self.ready and not interactive_only:
+                    return self.ready.popleft()
+                if not block:
+                    return None
+                self.condition.wait()
+
+    def _decode(self, request):
+        """Decode a request from _take, on this thread unless it is batched."""
+        if (
+            request.priority == "interactive"
+            and self.batcher is not None
+            and self._batchable(request)
+        ):
+            threading.Thread(
+                target=self.batcher.run,
+                args=(request,),
+                daemon=True,
+                name="ModelRequest",
+            ).start()
+            return
+        self._record_wait(request)
+        request.run(self.model, self._run_interactive)
+        self._finished(request)
+
+    def _run_interactive(self):
+        """Run the interactive requests waiting now (between batch pieces)."""
+        while True:
+            request = self._take(interactive_only=True, block=False)
+            if request is None:
+                return
+            self._decode(request)
+
+    def _batchable(self, request):
+        # Without VAD the batched pipeline can only take audio under 30 s
+        if request.options.get("vad_filter", True):
+            return True
+        return isinstance(request.audio, np.ndarray) and len(request.audio) < (
+            30 * SAMPLE_RATE
+        )
+
+    def _run(self):
+        while True:
+            self._decode(self._take())
+
+
+def remove_stale_socket(path):
+    """Prepare to listen on a Unix socket path, removing one left behind."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_socket_dir(directory)
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        # Left behind by a server that didn't exit cleanly
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"Another server is already listening on {path}")
+
+
+# Keyword arguments of WhisperModel.transcribe that daemon clients may set
+DAEMON_TRANSCRIBE_OPTIONS = {
+    "language",
+    "task",
+    "beam_size",
+    "temperature",
+    "initial_prompt",
+    "condition_on_previous_text",
+    "word_timestamps",
+    "vad_filter",
+    "vad_parameters",
+}
+
+
+def daemon_transcribe_options(requested):
+    """Validate client transcribe options and fill in SoupaWhisper's defaults."""
+    unknown = set(requested) - DAEMON_TRANSCRIBE_OPTIONS
+    if unknown:
+        raise ValueError(f"Unsupported options: {', '.join(sorted(unknown))}")
+    options = {"beam_size": 5, "vad_filter": True}
+    options.update(requested)
+    if options["vad_filter"] and "vad_parameters" not in options:
+        options["vad_parameters"] = get_vad_options()
+    return options
+
+
+def pcm_to_float32(data, pcm_format):
+    """Convert raw 16 kHz mono s16le or f32le bytes to a float32 array."""
+    if pcm_format == "s16le":
+        return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if pcm_format == "f32le":
+        return np.frombuffer(data, dtype="<f4")
+    raise ValueError(f"Unsupported PCM format '{pcm_format}' (use s16le or f32le)")
+
+
+def segment_to_dict(segment):
+    """Return the JSON form of a faster-whisper segment."""
+    result = {
+        "id": segment.id,
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text.strip(),
+    }
+    if segment.words:
+        result["words"] = [
+            {
+                "word": word.word,
+                "start": word.start,
+                "end": word.end,
+                "probability": word.probability,
+            }
+            for word in segment.words
+        ]
+    return result
+
+
+# A memfd must carry these seals before it is mapped: the client can then no
+# longer change the audio underneath the model or shrink it (which would
+# turn reads of the mapping into SIGBUS)
+REQUIRED_MEMFD_SEALS = fcntl.F_SEAL_WRITE | fcntl.F_SEAL_SHRINK
+
+
+def map_sealed_memfd(fd, size, pcm_format):
+    """
+    Map size bytes of a sealed memfd and return them as a float32 array.
+
+    f32le audio is a read-only view of the shared pages, without a copy;
+    s16le is converted, which copies once.
+    """
+    try:
+        seals = fcntl.fcntl(fd, fcntl.F_GET_SEALS)
+    except OSError:
+        raise ValueError("The passed descriptor is not a sealable memfd") from None
+    if seals & REQUIRED_MEMFD_SEALS != REQUIRED_MEMFD_SEALS:
+        raise ValueError("The memfd must be sealed with F_SEAL_WRITE and F_SEAL_SHRINK")
+    available = os.fstat(fd).st_size
+    if size is None:
+        size = available
+    if size > available:
+        raise ValueError(f"The memfd holds {available} bytes, not {size}")
+    if size == 0:
+        return np.zeros(0, dtype=np.float32)
+    # The array keeps the mapping alive after the fd is closed
+    mapping = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ)
+    if pcm_format == "f32le":
+        return np.frombuffer(mapping, dtype="<f4", count=size // 4)
+    return pcm_to_float32(memoryview(mapping)[: size - size % 2], pcm_format)
+
+
+class DaemonRequestHandler(socketserver.BaseRequestHandler):
+    """
+    Serve one client connection of the daemon protocol.
+
+    Requests are JSON lines. {"op": "status"} returns the daemon's status.
+    {"op": "transcribe", "path": ...} transcribes a file; with
+    "pcm": {"format": "s16le" | "f32le", "bytes": n} instead, n bytes of
+    16 kHz mono audio follow the line. With "pcm": {..., "fd": true} the
+    audio is instead in a sealed memfd passed with the request line
+    (SCM_RIGHTS), which is mapped rather than copied. Transcriptions are
+    "batch" priority unless the request has "priority": "interactive",
+    which queues it ahead of batch ones. Segments are sent as
+    {"segment": ...} lines while they are decoded, then {"done": true}.
+    Failures are reported as {"error": ...}.
+    """
+
+    server: DaemonServer
+    MAX_FDS = 4
+
+    def setup(self):
+        self.buffer = b""
+        self.fds: list[int] = []
+
+    def finish(self):
+        for fd in self.fds:
+            os.close(fd)
+
+    def _recv(self):
+        # recv_fds rather than recv, so descriptors sent along aren't dropped
+        data, fds, flags, _ = socket.recv_fds(self.request, 65536, self.MAX_FDS)
+        self.fds += fds
+        if flags & socket.MSG_CTRUNC:
+            raise ValueError(f"Too many file descriptors (at most {self.MAX_FDS})")
+        return data
+
+    def _read_line(self):
+        while b"\n" not in self.buffer:
+            data = self._recv()
+            if not data:
+                line, self.buffer = self.buffer, b""
+                return line
+            self.buffer += data
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line
+
+    def _read_exact(self, size):
+        chunks = [self.buffer[:size]]
+        received = len(chunks[0])
+        self.buffer = self.buffer[size:]
+        while received < size:
+            data = self.request.recv(min(size - received, 1 << 20))
+            if not data:
+                raise ValueError("Connection closed before all audio arrived")
+            chunks.append(data)
+            received += len(data)
+        return b"".join(chunks)
+
+    def _take_fd(self):
+        if not self.fds:
+            raise ValueError("Request asks for a memfd, but none was passed")
+        return self.fds.pop(0)
+
+    def handle(self):
+        while True:
+            try:
+                line = self._read_line()
+                if not line:
+                    return
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+                op = request.get("op")
+                if op == "status":
+                    self._send(self.server.status())
+                elif op == "transcribe":
+                    self._transcribe(request)
+                else:
+                    raise ValueError(f"Unknown op '{op}'")
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as e:
+                try:
+                    self._send({"error": str(e)})
+                except OSError:
+                    return
+
+    def _send(self, reply):
+        self.request.sendall(json.dumps(reply).encode() + b"\n")
+
+    def _read_audio(self, request):
+        if "pcm" in request:
+            pcm = request["pcm"]
+            pcm_format = pcm.get("format", "s16le")
+            if pcm.get("fd"):
+                fd = self._take_fd()
+                try:
+                    size = pcm.get("bytes")
+                    return map_sealed_memfd(
+                        fd, None if size is None else int(size), pcm_format
+                    )
+                finally:
+                    os.close(fd)
+            return pcm_to_float32(self._read_exact(int(pcm["bytes"])), pcm_format)
+        if "path" in request:
+            path = str(request["path"])
+            if not os.path.isfile(path):
+                raise ValueError(f"No such file: {path}")
+            return path
+        raise ValueError("transcribe needs 'path' or 'pcm'")
+
+    def _transcribe(self, request):
+        audio = self._read_audio(request)
+        options = daemon_transcribe_options(request.get("options") or {})
+        segments, info = self.server.scheduler.transcribe(
+            audio, priority=request.get("priority", "batch"), **options
+        )
+        texts = []
+        for segment in segments:
+            reply = segment_to_dict(segment)
+            texts.append(reply["text"])
+            self._send({"segment": reply})
+        self._send({"done": True, "text": " ".join(t for t in texts if t)})
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve transcriptions from a ModelScheduler on a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, path, scheduler, config, version=None):
+        self.path = path
+        self.scheduler = scheduler
+        self.config = config
+        self.version = version
+        remove_stale_socket(path)
+        super().__init__(path, DaemonRequestHandler)
+        os.chmod(path, 0o600)
+
+    def status(self):
+        return {
+            "status": "ready",
+            "version": self.version,
+            "pid": os.getpid(),
+            "model": self.config["model"],
+            "device": self.config["device"],
+            "compute_type": self.config["compute_type"],
+            "queued": self.scheduler.queued,
+            "queues": self.scheduler.metrics(),
+        }
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def start_daemon_server(scheduler, config, version=None):
+    """Serve the socket API from a background thread; return the server."""
+    server = DaemonServer(config["daemon_socket"], scheduler, config, version)
+    threading.Thread(
+        target=server.serve_forever, daemon=True, name="DaemonServer"
+    ).start()
+    print(f"Daemon listening on {server.path}")
+    return server
+
+
+# Uploads larger than this are rejected (about 4 hours of 16 kHz WAV)
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+
+def parse_multipart(content_type, body):
+    """
+    Parse a multipart/form-data body into {name: [(filename, bytes), ...]}.
+
+    Repeated fields (timestamp_granularities[]) keep every value, in order.
+    """
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise ValueError("Expected a multipart/form-data body")
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            fields.setdefault(name, []).append(
+                (part.get_filename(), part.get_payload(decode=True) or b"")
+            )
+    return fields
+
+
+def format_timestamp(seconds, separator):
+    """Format seconds as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT)."""
+    milliseconds = round(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def format_subtitles(segments, response_format):
+    """Render segments as an SRT or WebVTT document."""
+    separator = "," if response_format == "srt" else "."
+    blocks = ["WEBVTT\n"] if response_format == "vtt" else []
+    for index, segment in enumerate(segments, 1):
+        times = (
+            f"{format_timestamp(segment.start, separator)} --> "
+            f"{format_timestamp(segment.end, separator)}"
+        )
+        prefix = f"{index}\n" if response_format == "srt" else ""
+        blocks.append(f"{prefix}{times}\n{segment.text.strip()}\n")
+    return "\n".join(blocks)
+
+
+def verbose_segment(segment):
+    """Return a segment in the OpenAI verbose_json form."""
+    return {
+        "id": segment.id,
+        "seek": segment.seek,
+        "start": segment.start,
+        "end": segment.end,
+        "text": segment.text,
+        "tokens": segment.tokens,
+        "temperature": segment.temperature,
+        "avg_logprob": segment.avg_logprob,
+        "compression_ratio": segment.compression_ratio,
+        "no_speech_prob": segment.no_speech_prob,
+    }
+
+
+class TranscriptionHTTPHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serve POST /v1/audio/transcriptions in the OpenAI API format.
+
+    The multipart form takes file, language, prompt, temperature,
+    response_format (json, text, srt, vtt, verbose_json),
+    timestamp_granularities[], stream and (not in the OpenAI API)
+    priority, batch by default. model is accepted and ignored:
+    the loaded model answers. With stream=true, text deltas are sent as
+    server-sent events while segments are decoded.
+    """
+
+    server: Any
+    RESPONSE_FORMATS = ("json", "text", "srt", "vtt", "verbose_json")
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        print(f"HTTP {self.address_string()}: {format % args}")
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message):
+        self._send(
+            status,
+            {"error": {"message": message, "type": "invalid_request_error"}},
+        )
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            model = {"id": self.server.config["model"], "object": "model"}
+            self._send(200, {"object": "list", "data": [model]})
+        else:
+            self._error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") != "/v1/audio/transcriptions":
+            self._error(404, f"Unknown path {self.path}")
+            return
+        if int(self.headers.get("Content-Length") or 0) > MAX_UPLOAD_BYTES:
+            self._error(413, f"Upload larger than {MAX_UPLOAD_BYTES} bytes")
+            return
+        try:
+            form = self._read_form()
+            response_format, stream, options = self._parse_form(form)
+            priority = (
+                form["priority"][-1][1].decode().strip()
+                if "priority" in form
+                else "batch"
+            )
+            if priority not in PRIORITIES:
+                raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+
+        request = self.server.scheduler.submit(
+            io.BytesIO(form["file"][0][1]), priority, **options
+        )
+        segments = request.segments()
+        try:
+            if stream:
+                self._stream(segments)
+            else:
+                self._respond(request, list(segments), response_format)
+        except (BrokenPipeError, ConnectionResetError):
+            segments.close()
+        except Exception as e:
+            self._send(500, {"error": {"message": str(e), "type": "server_error"}})
+
+    def _read_form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise ValueError("Missing request body")
+        content_type = self.headers.get("Content-Type", "")
+        if not content_type.startswith("multipart/form-data"):
+            raise ValueError("Content-Type must be multipart/form-data")
+        form = parse_multipart(content_type, self.rfile.read(length))
+        if "file" not in form:
+            raise ValueError("Missing 'file' field")
+        return form
+
+    def _parse_form(self, form):
+        def value(name, default=""):
+            return form[name][-1][1].decode().strip() if name in form else default
+
+        response_format = value("response_format", "json")
+        if response_format not in self.RESPONSE_FORMATS:
+            raise ValueError(
+                f"response_format must be one of {', '.join(self.RESPONSE_FORMATS)}"
+            )
+        options: dict[str, Any] = {}
+        if value("language"):
+            options["language"] = value("language")
+        if value("prompt"):
+            options["initial_prompt"] = value("prompt")
+        if value("temperature"):
+            options["temperature"] = float(value("temperature"))
+        granularities = {
+            data.decode().strip()
+            for name in ("timestamp_granularities[]", "timestamp_granularities")
+            for _, data in form.get(name, [])
+        }
+        if "word" in granularities:
+            options["word_timestamps"] = True
+        stream = value("stream", "false").lower() == "true"
+        return response_format, stream, daemon_transcribe_options(options)
+
+    def _respond(self, request, segments, response_format):
+        text = " ".join(t for t in (s.text.strip() for s in segments) if t)
+        if response_format == "json":
+            self._send(200, {"text": text})
+        elif response_format == "text":
+            self._send(200, text, "text/plain")
+        elif response_format in ("srt", "vtt"):
+            content_type = "text/vtt" if response_format == "vtt" else "text/plain"
+            self._send(200, format_subtitles(segments, response_format), content_type)
+        else:
+            result = {
+                "task": "transcribe",
+                "language": request.info.language if request.info else None,
+                "duration": request.info.duration if request.info else None,
+                "text": text,
+                "segments": [verbose_segment(s) for s in segments],
+            }
+            if request.options.get("word_timestamps"):
+                result["words"] = [
+                    {"word": w.word, "start": w.start, "end": w.end}
+                    for s in segments
+                    for w in s.words or []
+                ]
+            self._send(200, result)
+
+    def _stream(self, segments):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def event(data):
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        text = ""
+        try:
+            for segment in segments:
+                piece = segment.text.strip()
+                if not piece:
+                    continue
+                delta = f" {piece}" if text else piece
+                text += delta
+                event({"type": "transcript.text.delta", "delta": delta})
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            event({"type": "error", "error": {"message": str(e)}})
+            return
+        event({"type": "transcript.text.done", "text": text})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class TranscriptionHTTPServer(http.server.ThreadingHTTPServer):
+    """OpenAI-compatible transcription endpoint on a TCP port."""
+
+    daemon_threads = True
+
+    def __init__(self, address, scheduler, config):
+        self.scheduler = scheduler
+        self.config = config
+        super().__init__(address, TranscriptionHTTPHandler)
+
+
+class UnixTranscriptionHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """OpenAI-compatible transcription endpoint on a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, path, scheduler, config):
+        self.scheduler = scheduler
+        self.config = config
+        self.path = path
+        remove_stale_socket(path)
+        super().__init__(path, TranscriptionHTTPHandler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def start_http_server(scheduler, config):
+    """
+    Serve the HTTP endpoint from a background thread; return the server.
+
+    config["http"] is host:port, or unix:/path for a Unix socket.
+    """
+    address = config["http"]
+    server: socketserver.BaseServer
+    if address.startswith("unix:"):
+        server = UnixTranscriptionHTTPServer(address[5:], scheduler, config)
+    else:
+        host, _, port = address.rpartition(":")
+        server = TranscriptionHTTPServer(
+            (host or "127.0.0.1", int(port)), scheduler, config
+        )
+        if host not in ("", "127.0.0.1", "localhost", "::1"):
+            print(
+                f"Warning: the HTTP endpoint has no authentication and listens on {host}"
+            )
+    threading.Thread(
+        target=server.serve_forever, daemon=True, name="HTTPServer"
+    ).start()
+    print(f"OpenAI-compatible endpoint: {address}/v1/audio/transcriptions")
+    return server
+
+
+class RemoteModel:
+    """
+    Transcribe with a running daemon's model instead of loading one.
+
+    Provides the part of WhisperModel.transcribe the hotkey front end uses.
+    Arrays are passed as f32le PCM in a sealed memfd; segments come back as
+    they are decoded.
+    """
+
+    def __init__(self, socket_path):
+        self.client = DaemonClient(socket_path)
+        self.status = self.client.status()
+
+    def transcribe(self, audio, vad_parameters=None, **options):
+        if vad_parameters is not None:
+            options["vad_parameters"] = asdict(vad_parameters)
+        if isinstance(audio, str):
+            segments = self.client.transcribe_file(
+                audio, priority="interactive", **options
+            )
+        else:
+            # One copy into shared memory; the daemon maps it as it is
+            fd = sealed_memfd(np.ascontiguousarray(audio, dtype="<f4"))
+            try:
+                segments = self.client.transcribe_fd(
+                    fd, "f32le", priority="interactive", **options
+                )
+            finally:
+                os.close(fd)
+        return (self._segment(s) for s in segments), None
+
+    @staticmethod
+    def _segment(data):
+        words = [types.SimpleNamespace(**word) for word in data.get("words", [])]
+        return types.SimpleNamespace(**{**data, "words": words or None})
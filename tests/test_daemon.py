@@ -0,0 +1,107 @@
+import http.client
+import json
+import uuid
+
+import pytest
+
+import soupawhisper_daemon
+
+
+class FakeRequest:
+    def __init__(self, options):
+        self.options = options
+        self.info = None
+
+    def segments(self):
+        return iter([])
+
+
+class FakeScheduler:
+    """Records what the HTTP endpoint submits instead of decoding it."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, audio, priority="interactive", **options):
+        self.submitted.append((audio.read(), priority, options))
+        return FakeRequest(options)
+
+
+def multipart(fields):
+    boundary = uuid.uuid4().hex
+    body = b""
+    for name, value in fields:
+        disposition = f'form-data; name="{name}"'
+        if name == "file":
+            disposition += '; filename="audio.wav"'
+        body += (
+            f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+            + value
+            + b"\r\n"
+        )
+    body += f"--{boundary}--\r\n".encode()
+    return f"multipart/form-data; boundary={boundary}", body
+
+
+@pytest.fixture
+def http_server(monkeypatch):
+    # Default VAD options come from faster-whisper, which isn't needed here
+    monkeypatch.setattr(soupawhisper_daemon, "get_vad_options", lambda: "vad")
+    scheduler = FakeScheduler()
+    server = soupawhisper_daemon.start_http_server(
+        scheduler, {"http": "127.0.0.1:0", "model": "base.en"}
+    )
+    yield server, scheduler
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, fields):
+    content_type, body = multipart(fields)
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    connection.request(
+        "POST",
+        "/v1/audio/transcriptions",
+        body,
+        {"Content-Type": content_type},
+    )
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+
+def test_parse_multipart_keeps_repeated_fields():
+    content_type, body = multipart(
+        [
+            ("file", b"RIFF"),
+            ("timestamp_granularities[]", b"word"),
+            ("timestamp_granularities[]", b"segment"),
+        ]
+    )
+    form = soupawhisper_daemon.parse_multipart(content_type, body)
+    assert form["file"] == [("audio.wav", b"RIFF")]
+    assert form["timestamp_granularities[]"] == [(None, b"word"), (None, b"segment")]
+
+
+def test_http_timestamp_granularities(http_server):
+    server, scheduler = http_server
+    status, reply = post(
+        server,
+        [
+            ("file", b"RIFF"),
+            ("model", b"whisper-1"),
+            ("timestamp_granularities[]", b"word"),
+            ("timestamp_granularities[]", b"segment"),
+        ],
+    )
+    assert (status, reply) == (200, {"text": ""})
+    audio, priority, options = scheduler.submitted[0]
+    assert (audio, priority) == (b"RIFF", "batch")
+    assert options["word_timestamps"] is True
+
+    post(
+        server,
+        [("file", b"RIFF"), ("timestamp_granularities[]", b"segment")],
+    )
+    assert "word_timestamps" not in scheduler.submitted[1][2]
@@ -0,0 +1,228 @@
+import queue
+import struct
+import time
+
+import numpy as np
+import pytest
+
+import dictate
+
+WORD_BITS = struct.calcsize("l") * 8
+
+EV_SYN, EV_KEY, EV_REL, EV_MSC = 0, 1, 2, 4
+KEY_ESC, KEY_A, KEY_F9, KEY_POWER, BTN_LEFT = 1, 30, 67, 116, 272
+
+
+def bitmap(bits):
+    """Format bits the way sysfs prints a capability bitmap."""
+    value = sum(1 << bit for bit in bits)
+    words = []
+    while value or not words:
+        words.append(f"{value & ((1 << WORD_BITS) - 1):x}")
+        value >>= WORD_BITS
+    return " ".join(reversed(words))
+
+
+def add_device(root, event_name, name, ev_bits, key_bits):
+    device = root / event_name / "device"
+    (device / "capabilities").mkdir(parents=True)
+    (device / "name").write_text(name + "\n")
+    (device / "capabilities" / "ev").write_text(bitmap(ev_bits) + "\n")
+    (device / "capabilities" / "key").write_text(bitmap(key_bits) + "\n")
+
+
+@pytest.fixture(autouse=True)
+def default_config(monkeypatch):
+    # Keyboards are ranked without a preferred_device from the user's config
+    monkeypatch.setattr(dictate, "get_config", lambda: {"preferred_keyboard": ""})
+
+
+def test_parse_capability_bitmap():
+    assert dictate._parse_capability_bitmap("0") == set()
+    assert dictate._parse_capability_bitmap("120013") == {0, 1, 4, 17, 20}
+    assert dictate._parse_capability_bitmap("1 0") == {WORD_BITS}
+    assert dictate._parse_capability_bitmap(bitmap({KEY_F9, BTN_LEFT})) == {
+        KEY_F9,
+        BTN_LEFT,
+    }
+
+
+def test_scan_sysfs_keyboards(tmp_path):
+    keyboard_keys = set(range(KEY_ESC, 128))
+    add_device(tmp_path, "event0", "Power Button", {EV_SYN, EV_KEY}, {KEY_POWER})
+    add_device(
+        tmp_path,
+        "event1",
+        "Logitech USB Optical Mouse",
+        {EV_SYN, EV_KEY, EV_REL, EV_MSC},
+        {BTN_LEFT, BTN_LEFT + 1, BTN_LEFT + 2},
+    )
+    add_device(
+        tmp_path, "event2", "dotool virtual keyboard", {EV_SYN, EV_KEY}, keyboard_keys
+    )
+    add_device(
+        tmp_path,
+        "event3",
+        "AT Translated Set 2 keyboard",
+        {EV_SYN, EV_KEY, EV_MSC},
+        keyboard_keys,
+    )
+    add_device(tmp_path, "event4", "Macro Pad", {EV_SYN, EV_KEY}, {KEY_A, KEY_F9})
+    # Not a device directory: ignored rather than failing the scan
+    (tmp_path / "event5").mkdir()
+    (tmp_path / "mouse0").mkdir()
+
+    candidates, available = dictate._scan_sysfs_keyboards(KEY_F9, root=str(tmp_path))
+
+    assert candidates == [
+        ("event3", "AT Translated Set 2 keyboard", len(keyboard_keys)),
+        ("event4", "Macro Pad", 2),
+    ]
+    assert available == [
+        ("event0", "Power Button"),
+        ("event1", "Logitech USB Optical Mouse"),
+        ("event2", "dotool virtual keyboard"),
+        ("event3", "AT Translated Set 2 keyboard"),
+        ("event4", "Macro Pad"),
+    ]
+
+
+def test_scan_sysfs_keyboards_without_sysfs(tmp_path):
+    assert dictate._scan_sysfs_keyboards(KEY_F9, root=str(tmp_path / "none")) is None
+
+
+class FakeUInput:
+    """Records what UInputTyper writes instead of creating a device."""
+
+    def __init__(self, capabilities):
+        self.capabilities = capabilities
+        self.frames = [[]]
+
+    def write(self, event_type, code, value):
+        self.frames[-1].append((event_type, code, value))
+
+    def syn(self):
+        self.frames.append([])
+
+    def close(self):
+        pass
+
+
+def test_uinput_typer_frames():
+    ecodes = pytest.importorskip("evdev").ecodes
+    typer = dictate.UInputTyper("us", key_delay_ms=0, uinput_factory=FakeUInput)
+    device = typer.device
+
+    typer.type("a!")
+    shift, key_a, key_1 = ecodes.KEY_LEFTSHIFT, ecodes.KEY_A, ecodes.KEY_1
+    assert device.frames == [
+        [(ecodes.EV_KEY, key_a, 1)],
+        [(ecodes.EV_KEY, key_a, 0)],
+        [(ecodes.EV_KEY, shift, 1), (ecodes.EV_KEY, key_1, 1)],
+        [(ecodes.EV_KEY, key_1, 0), (ecodes.EV_KEY, shift, 0)],
+        [],
+    ]
+
+
+def test_uinput_typer_modifier_order():
+    ecodes = pytest.importorskip("evdev").ecodes
+    typer = dictate.UInputTyper(
+        "us",
+        key_delay_ms=0,
+        uinput_factory=FakeUInput,
+        extra_keys=["KEY_LEFTCTRL", "KEY_V"],
+    )
+    ctrl, shift, key_v = typer.codes(["KEY_LEFTCTRL", "KEY_LEFTSHIFT", "KEY_V"])
+    assert {ctrl, shift, key_v} <= set(typer.device.capabilities[ecodes.EV_KEY])
+
+    typer.press(key_v, (ctrl, shift))
+    # Modifiers go down first and come up last, in reverse order
+    assert typer.device.frames == [
+        [
+            (ecodes.EV_KEY, ctrl, 1),
+            (ecodes.EV_KEY, shift, 1),
+            (ecodes.EV_KEY, key_v, 1),
+        ],
+        [
+            (ecodes.EV_KEY, key_v, 0),
+            (ecodes.EV_KEY, shift, 0),
+            (ecodes.EV_KEY, ctrl, 0),
+        ],
+        [],
+    ]
+
+
+def test_uinput_pastes_characters_without_keys(monkeypatch):
+    ecodes = pytest.importorskip("evdev").ecodes
+    monkeypatch.setattr(
+        dictate.UInputTyper,
+        "_create_uinput",
+        classmethod(lambda cls, caps: FakeUInput(caps)),
+    )
+    config = {"paste_keys": "ctrl+v", "keymap": "us", "key_delay_ms": 0}
+    output = dictate.OutputManager("uinput", config)
+    copied = []
+    monkeypatch.setattr(output, "copy", copied.append)
+
+    assert output.can_type("it’s fine")
+    assert not output.can_type("café")
+    output.type_text("café")
+
+    assert copied == ["café"]
+    ctrl, key_v = ecodes.KEY_LEFTCTRL, ecodes.KEY_V
+    assert output.uinput.device.frames == [
+        [(ecodes.EV_KEY, ctrl, 1), (ecodes.EV_KEY, key_v, 1)],
+        [(ecodes.EV_KEY, key_v, 0), (ecodes.EV_KEY, ctrl, 0)],
+        [],
+    ]
+
+
+def test_notifier_survives_missing_notify_send(monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("DBUS_SESSION_BUS_ADDRESS", f"unix:path={tmp_path}/bus")
+    monkeypatch.setenv("PATH", str(tmp_path))
+    notifier = dictate.Notifier()
+    for message in ("first", "second"):
+        notifier.notify("SoupaWhisper", message, "dialog-information", 1000)
+        for _ in range(100):
+            with notifier._condition:
+                if notifier.pending is None:
+                    break
+            time.sleep(0.01)
+    time.sleep(0.1)
+
+    assert notifier.pending is None
+    assert capsys.readouterr().out.count("could not send notification") == 2
+
+
+def test_stop_recording_leaves_recorder_exit_to_worker():
+    # A recorder that keeps writing samples for a while after SIGINT
+    command = [
+        "python3",
+        "-c",
+        "import signal, sys, time\n"
+        "signal.signal(signal.SIGINT, lambda *a: (time.sleep(0.5), sys.exit()))\n"
+        "while True:\n"
+        "    sys.stdout.buffer.write(bytes(3200)); sys.stdout.flush()\n"
+        "    time.sleep(0.1)\n",
+    ]
+    dictation = dictate.Dictation.__new__(dictate.Dictation)
+    dictation.recording = True
+    dictation.warm_capture = None
+    dictation.audio = dictate.PcmBuffer()
+    dictation.recorder = dictate.PipeRecorder(command, dictation.audio.append)
+    dictation.record_process = None
+    dictation.temp_file = None
+    dictation.incremental = dictation.live = None
+    dictation.jobs = queue.Queue()
+    time.sleep(0.3)
+
+    start = time.monotonic()
+    dictation.stop_recording()
+    assert time.monotonic() - start < 0.2
+    assert dictation.recorder is None
+
+    job = dictation.jobs.get_nowait()
+    assert job.audio is None
+    job.finish_recording()
+    assert job.recorder is None and job.buffer is None
+    assert len(job.audio) > 0 and job.audio.dtype == np.float32